@@ -1,5 +1,8 @@
+import os
 import streamlit as st
-from caption_generator import generate_caption, suggest_hashtags, suggest_emojis
+import metrics
+from platforms import PLATFORM_LENGTHS, char_limit
+from caption_generator import coalescing_stats, generate_captions, load_stats, router_stats, stream_caption, suggest_hashtags, suggest_emojis
 
 # Streamlit app configuration
 st.set_page_config(
@@ -34,6 +37,13 @@ st.markdown("""
 st.title("📱 Social Media Caption Generator")
 st.markdown("Create engaging captions, hashtags, and emojis for your social media posts!")
 
+# Collection is process-wide and set by CAPTION_METRICS; the checkbox only
+# shows or hides this session's debug panel
+show_metrics = st.sidebar.checkbox("🔧 Show debug metrics", key="debug_metrics")
+# Resetting clears the counters every session sees, so only operators who
+# start the app with CAPTION_METRICS_ADMIN=1 get the button
+METRICS_ADMIN = os.environ.get('CAPTION_METRICS_ADMIN', '').lower() in ('1', 'true', 'yes')
+
 col1, col2 = st.columns([1.5, 1])
 
 with col1:
@@ -47,26 +57,46 @@ with col1:
     st.subheader("⚙️ Advanced Options")
     num_captions = st.slider("Number of caption variations", 1, 3, 1)
     include_cta = st.checkbox("Include Call-to-Action", value=True)
+    seed = st.number_input("Seed (0 = random)", min_value=0, value=0, step=1,
+                           help="Reuse a seed to get the same captions again; seeded results are cached")
     generate_clicked = st.button("🚀 Generate Content", type="primary", use_container_width=True)
 
     if generate_clicked:
         if keywords.strip():
-            with st.spinner("🤖 AI is crafting your content..."):
-                try:
-                    captions = []
-                    for i in range(num_captions):
-                        caption = generate_caption(keywords, platform, tone, include_cta)
-                        captions.append(caption)
+            try:
+                seed_value = int(seed) or None
+                timings = None
+                if seed_value is None:
+                    # Stream the first caption; decoding runs in the background
+                    # while hashtags and emojis are computed and shown
+                    stream = stream_caption(keywords, platform, tone, include_cta)
                     hashtags = suggest_hashtags(keywords, platform)
                     emojis = suggest_emojis(keywords, platform)
-                    st.session_state.generated_content = {
-                        'captions': captions,
-                        'hashtags': hashtags,
-                        'emojis': emojis,
-                        'platform': platform
-                    }
-                except Exception as e:
-                    st.error(f"❌ Error generating content: {str(e)}")
+                    suggestions = f"{' '.join(hashtags)} {' '.join(emojis)}"
+                    live = st.empty()
+                    live.markdown(f"### ✍️ AI is crafting your content...\n\n▌\n\n{suggestions}")
+                    for partial in stream:
+                        live.markdown(f"### ✍️ AI is crafting your content...\n\n{partial} ▌\n\n{suggestions}")
+                    live.empty()
+                    captions = [stream.caption]
+                    timings = {'first_token': stream.time_to_first_token, 'first_caption': stream.total_latency}
+                    if num_captions > 1:
+                        with st.spinner("🤖 AI is crafting more variations..."):
+                            captions += generate_captions(keywords, platform, tone, num_captions - 1, include_cta)
+                else:
+                    with st.spinner("🤖 AI is crafting your content..."):
+                        captions = generate_captions(keywords, platform, tone, num_captions, include_cta, seed=seed_value)
+                        hashtags = suggest_hashtags(keywords, platform)
+                        emojis = suggest_emojis(keywords, platform)
+                st.session_state.generated_content = {
+                    'captions': captions,
+                    'hashtags': hashtags,
+                    'emojis': emojis,
+                    'platform': platform,
+                    'timings': timings
+                }
+            except Exception as e:
+                st.error(f"❌ Error generating content: {str(e)}")
         else:
             st.error("⚠️ Please enter keywords or a theme to generate content.")
 
@@ -74,14 +104,16 @@ with col1:
     if 'generated_content' in st.session_state:
         content = st.session_state.generated_content
         st.markdown("## 📝 Generated Content")
+        if content.get('timings'):
+            st.caption(f"⏱️ First token after {content['timings']['first_token']:.2f}s, "
+                       f"first caption done after {content['timings']['first_caption']:.2f}s")
         for i, caption in enumerate(content['captions']):
             if len(content['captions']) > 1:
                 st.markdown(f"### Caption Option {i+1}")
             else:
                 st.markdown("### Generated Caption")
             char_count = len(caption)
-            platform_limits = {"Instagram": 2200, "Twitter": 280, "LinkedIn": 3000, "Facebook": 63206}
-            limit = platform_limits.get(content['platform'], 2200)
+            limit = char_limit(content['platform'])
             if char_count <= limit:
                 st.success(f"✅ {char_count}/{limit} characters")
             else:
@@ -110,14 +142,37 @@ with col2:
     - Don't overuse emojis
     """)
     st.markdown("### 📏 Character Limits")
-    limits = {
-        "Instagram": "2,200",
-        "Twitter": "280", 
-        "LinkedIn": "3,000",
-        "Facebook": "63,206"
-    }
-    for platform, limit in limits.items():
-        st.text(f"{platform}: {limit}")
+    for platform, limit in PLATFORM_LENGTHS.items():
+        st.text(f"{platform}: {limit:,}")
+
+if show_metrics:
+    snapshot = metrics.snapshot()
+    st.sidebar.markdown("### ⏱️ Stage Timings")
+    if not metrics.enabled():
+        st.sidebar.caption("Start the app with CAPTION_METRICS=1 to record stage timings.")
+    elif snapshot['stages']:
+        st.sidebar.table({
+            stage: {"calls": values['count'], "mean ms": round(values['mean_ms'], 2), "max ms": round(values['max_ms'], 2)}
+            for stage, values in snapshot['stages'].items()
+        })
+    else:
+        st.sidebar.caption("Generate some content to record timings.")
+    if snapshot['counters']:
+        st.sidebar.markdown("### 🔢 Counters")
+        st.sidebar.json(snapshot['counters'])
+    st.sidebar.markdown("### 🧠 Model Load")
+    st.sidebar.json(load_stats())
+    st.sidebar.markdown("### 🤝 Shared Generations")
+    st.sidebar.json(coalescing_stats())
+    routes = router_stats()
+    if routes is not None:
+        st.sidebar.markdown("### 🚦 Latency SLO Routing")
+        st.sidebar.json(routes)
+    with st.sidebar.expander("Prometheus export"):
+        st.code(metrics.prometheus_text(), language="text")
+    if METRICS_ADMIN and st.sidebar.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
 
 # Footer
 st.markdown("---")
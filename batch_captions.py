@@ -0,0 +1,206 @@
+"""
+Headless batch mode for the Social Media Caption Generator.
+
+Streams (keywords, platform, tone) rows from a CSV or JSONL file, generates a
+caption, hashtags and emojis for each row and appends the results to a JSONL
+file. Rows are read in bounded windows, grouped into model micro-batches by
+prompt length, and a checkpoint written after every window lets a killed job
+resume without redoing finished rows.
+
+Each output line is the input row plus ``caption``, ``hashtags`` and
+``emojis``, with the input's position in ``_row``. Rows that cannot be used
+(malformed JSON, missing keywords, unknown tone) get an ``_error`` message
+instead and the job carries on.
+
+Usage:
+    python batch_captions.py input.csv output.jsonl --batch-size 16
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+from caption_generator import (
+    TONE_TEMPLATES,
+    build_prompt,
+    generate_captions_batch,
+    load_model,
+    suggest_emojis_batch,
+    suggest_hashtags_batch,
+    worker_pool,
+)
+
+DEFAULT_PLATFORM = "Instagram"
+DEFAULT_TONE = "Casual"
+
+
+class InvalidRow(ValueError):
+    """A JSONL line that does not hold a JSON object; ``line`` is its raw text"""
+
+    def __init__(self, message, line):
+        super().__init__(message)
+        self.line = line
+
+
+def read_rows(path):
+    """
+    Yield input rows as dicts, streaming from a CSV or JSONL file.
+
+    A JSONL line that is not a JSON object is yielded as an ``InvalidRow``
+    so one bad line does not end the job.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield InvalidRow(f"malformed JSON: {e}", line)
+                    continue
+                yield row if isinstance(row, dict) else InvalidRow("expected a JSON object", line)
+        else:
+            for row in csv.DictReader(f):
+                yield row
+
+
+def _parse_bool(value, default=True):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'n', 'off')
+
+
+def _text_field(row, name, default=''):
+    value = row.get(name) or default
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string")
+    return value.strip()
+
+
+def normalize_row(row):
+    """Fill in defaults and validate a raw input row"""
+    keywords = _text_field(row, 'keywords')
+    platform = _text_field(row, 'platform', DEFAULT_PLATFORM)
+    tone = _text_field(row, 'tone', DEFAULT_TONE)
+    if not keywords:
+        raise ValueError("missing keywords")
+    if tone not in TONE_TEMPLATES:
+        raise ValueError(f"unknown tone: {tone}")
+    return keywords, platform, tone, _parse_bool(row.get('include_cta'))
+
+
+def load_checkpoint(path):
+    """Return (rows_done, output_bytes) from a checkpoint file, or zeros"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        return state['rows_done'], state['output_bytes']
+    except (OSError, ValueError, KeyError):
+        return 0, 0
+
+
+def save_checkpoint(path, rows_done, output_bytes):
+    """Atomically record how far the job has got"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'rows_done': rows_done, 'output_bytes': output_bytes}, f)
+    os.replace(tmp, path)
+
+
+def _prompt_length(generator, prompt):
+    if generator is None:
+        return len(prompt)
+    return len(generator.tokenizer(prompt)['input_ids'])
+
+
+def process_window(window, generator, batch_size):
+    """
+    Generate results for one window of (index, row) pairs.
+
+    Valid rows are sorted by prompt length (in tokens, or characters without
+    a ``generator``) and split into micro-batches so each batched model call
+    pads as little as possible. Results come back in input order.
+    """
+    results = {}
+    pending = []
+    for index, row in window:
+        if isinstance(row, InvalidRow):
+            results[index] = {'_input': row.line, '_row': index, '_error': str(row)}
+            continue
+        try:
+            pending.append((index, row, normalize_row(row)))
+        except ValueError as e:
+            results[index] = dict(row, _row=index, _error=str(e))
+
+    pending.sort(key=lambda item: _prompt_length(generator, build_prompt(item[2][0], item[2][2])))
+    captions = {}
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        generated = generate_captions_batch([request for _, _, request in chunk])
+        for (index, _, _), (caption,) in zip(chunk, generated):
+            captions[index] = caption
+
+    # One suggestion call per window, so the semantic index scores it in one product
+    items = [(keywords, platform) for _, _, (keywords, platform, _, _) in pending]
+    suggestions = zip(suggest_hashtags_batch(items), suggest_emojis_batch(items))
+    for (index, row, _), (hashtags, emojis) in zip(pending, suggestions):
+        results[index] = dict(row, _row=index, caption=captions[index], hashtags=hashtags, emojis=emojis)
+
+    return [results[index] for index, _ in window]
+
+
+def run(input_path, output_path, batch_size=16, window_size=256, checkpoint_path=None):
+    """Run (or resume) a batch job and return the number of rows processed"""
+    checkpoint_path = checkpoint_path or output_path + '.ckpt'
+    rows_done, output_bytes = load_checkpoint(checkpoint_path)
+    if not os.path.exists(output_path):
+        rows_done, output_bytes = 0, 0
+    # With a worker pool the model lives in the workers; sort by characters
+    # rather than load a second copy here just for its tokenizer
+    generator = load_model() if worker_pool() is None else None
+
+    # Drop anything written after the last checkpoint, then append
+    with open(output_path, 'r+b' if rows_done else 'wb') as out:
+        out.seek(output_bytes)
+        out.truncate()
+
+        rows = itertools.islice(enumerate(read_rows(input_path)), rows_done, None)
+        processed = 0
+        while True:
+            window = list(itertools.islice(rows, window_size))
+            if not window:
+                break
+            for result in process_window(window, generator, batch_size):
+                out.write((json.dumps(result, ensure_ascii=False) + '\n').encode('utf-8'))
+            out.flush()
+            os.fsync(out.fileno())
+
+            rows_done = window[-1][0] + 1
+            processed += len(window)
+            save_checkpoint(checkpoint_path, rows_done, out.tell())
+            print(f"{rows_done} rows done", file=sys.stderr)
+
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate captions, hashtags and emojis for a CSV/JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL file with keywords, platform, tone and optional include_cta columns")
+    parser.add_argument("output", help="JSONL file to append results to")
+    parser.add_argument("--batch-size", type=int, default=16, help="Rows per batched model call")
+    parser.add_argument("--window-size", type=int, default=256, help="Rows read and sorted by prompt length at a time")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.ckpt)")
+    args = parser.parse_args(argv)
+
+    processed = run(args.input, args.output, args.batch_size, args.window_size, args.checkpoint)
+    print(f"Processed {processed} rows", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
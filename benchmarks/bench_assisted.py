@@ -0,0 +1,123 @@
+"""
+Single-caption latency with and without assisted (speculative) decoding.
+
+For every tone template this times one caption generated normally (from the
+cached tone prefix, as in production) against the same caption generated
+with the draft model proposing tokens for the main model to verify. Both use
+identical sampling parameters and seeds.
+
+The accepted-token rate is estimated from the ids generate returned and
+forward-pass counts: every main-model pass in assisted mode keeps the draft
+tokens it agrees with plus one token of its own, so accepted = new ids -
+main passes, out of one proposed token per draft pass (clamped to 0-100%).
+New ids are the generate output length minus the input length, so they do
+not depend on how the text decodes or is post-processed.
+
+Run from the repository root:
+    python -m benchmarks.bench_assisted --draft distilgpt2 --repeats 10
+"""
+import argparse
+import os
+import statistics
+import time
+
+import torch
+
+KEYWORDS = ["morning coffee routine", "travel adventure", "team success", "fitness goals", "new tech launch"]
+
+
+class _NewTokenCounter:
+    """Record how many ids each ``model.generate`` call appended to its input"""
+
+    def __init__(self, model):
+        self.last = 0
+        self._generate = model.generate
+        model.generate = self._counted
+
+    def _counted(self, *args, **kwargs):
+        output = self._generate(*args, **kwargs)
+        self.last = output.shape[1] - kwargs['input_ids'].shape[1]
+        return output
+
+
+class _PassCounter:
+    def __init__(self, model):
+        self.calls = 0
+        self._handle = model.register_forward_hook(self._count)
+
+    def _count(self, module, inputs, output):
+        self.calls += 1
+
+    def take(self):
+        calls, self.calls = self.calls, 0
+        return calls
+
+
+def _run(generator, prompt, tone, seed, assisted, new_tokens):
+    """Generate one continuation; returns (seconds, ids generated)"""
+    from caption_generator import _generate_texts
+
+    torch.manual_seed(seed)
+    start = time.perf_counter()
+    _generate_texts(generator, [prompt], tone=tone, assisted=assisted)
+    elapsed = time.perf_counter() - start
+    return elapsed, new_tokens.last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real"], default="real")
+    parser.add_argument("--draft", default="distilgpt2", help="Draft model (CAPTION_DRAFT_MODEL)")
+    parser.add_argument("--draft-tokens", type=int, help="Tokens proposed per step (CAPTION_DRAFT_TOKENS)")
+    parser.add_argument("--repeats", type=int, default=10, help="Seeds per keyword set")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        # The stub doubles as its own draft: same tokenizer, every token accepted
+        args.draft = use_stub_model()
+    os.environ['CAPTION_DRAFT_MODEL'] = args.draft
+    if args.draft_tokens:
+        os.environ['CAPTION_DRAFT_TOKENS'] = str(args.draft_tokens)
+
+    from caption_generator import TONE_TEMPLATES, _model_cache, build_prompt, load_model
+
+    generator = load_model()
+    if generator is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+    draft = _model_cache.get('draft')
+    if draft is None:
+        raise SystemExit(f"Draft model {args.draft} could not be loaded; nothing to compare.")
+    main_passes, draft_passes = _PassCounter(generator.model), _PassCounter(draft)
+    counter = _NewTokenCounter(generator.model)
+
+    print(f"model={args.model} draft={args.draft}, {args.repeats * len(KEYWORDS)} captions per tone")
+    print(f"{'tone':<14} {'normal ms':>10} {'assisted ms':>12} {'speedup':>8} {'accepted':>9} {'tok/pass':>9}")
+    for tone in TONE_TEMPLATES:
+        normal, assisted = [], []
+        tokens = main = proposed = 0
+        for keywords in KEYWORDS:
+            prompt = build_prompt(keywords, tone)
+            _run(generator, prompt, tone, 0, False, counter)  # Warm-up
+            _run(generator, prompt, tone, 0, True, counter)
+            main_passes.take(), draft_passes.take()
+            for seed in range(args.repeats):
+                normal.append(_run(generator, prompt, tone, seed, False, counter)[0])
+                main_passes.take()
+                elapsed, new_tokens = _run(generator, prompt, tone, seed, True, counter)
+                assisted.append(elapsed)
+                tokens += new_tokens
+                main += main_passes.take()
+                proposed += draft_passes.take()
+        if _model_cache.get('draft') is None:
+            raise SystemExit("Assisted decoding failed and the draft model was dropped; see the warning above.")
+        normal_ms, assisted_ms = statistics.median(normal) * 1000, statistics.median(assisted) * 1000
+        accepted = min(max(tokens - main, 0) / proposed, 1.0) if proposed else 0.0
+        print(
+            f"{tone:<14} {normal_ms:>10.1f} {assisted_ms:>12.1f} {normal_ms / assisted_ms:>7.2f}x "
+            f"{accepted:>8.0%} {tokens / main if main else 0:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
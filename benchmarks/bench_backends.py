@@ -0,0 +1,139 @@
+"""
+Compare CPU inference backends (fp32, bf16, int8) on a fixed prompt set.
+
+Each backend runs in a fresh process so resident memory and thread settings
+are measured in isolation. Reported per backend: median single-prompt
+latency, batched throughput in generated tokens per second, peak resident
+memory, and output drift against fp32 as the share of greedy-decoded tokens
+that match the fp32 continuation.
+
+Run from the repository root:
+    python -m benchmarks.bench_backends --intra-op-threads 4 --inter-op-threads 1
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+KEYWORDS = ["morning coffee routine", "travel adventure", "team success", "healthy breakfast"]
+NEW_TOKENS = 24
+
+
+def _prompts():
+    from caption_generator import TONE_TEMPLATES, build_prompt
+
+    return [build_prompt(keywords, tone) for tone in TONE_TEMPLATES for keywords in KEYWORDS]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(backend, repeats):
+    """Measure one backend in this process and print the results as JSON"""
+    os.environ['CAPTION_BACKEND'] = backend
+    os.environ['CAPTION_PREFIX_CACHE'] = '0'
+    import torch
+    from caption_generator import load_model
+
+    start = time.perf_counter()
+    generator = load_model()
+    load_time = time.perf_counter() - start
+    if generator is None:
+        raise SystemExit(f"{backend}: model could not be loaded")
+    model, tokenizer = generator.model, generator.tokenizer
+    tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = 'left'
+    greedy = dict(do_sample=False, max_new_tokens=NEW_TOKENS, min_new_tokens=NEW_TOKENS,
+                  pad_token_id=tokenizer.eos_token_id)
+    prompts = _prompts()
+
+    # Single-prompt latency; greedy continuations double as the drift sample
+    latencies, continuations = [], []
+    for repeat in range(repeats):
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors='pt')
+            began = time.perf_counter()
+            with torch.no_grad():
+                output = model.generate(**inputs, **greedy)
+            latencies.append(time.perf_counter() - began)
+            if repeat == 0:
+                continuations.append(output[0, inputs['input_ids'].shape[1]:].tolist())
+
+    # Batched throughput over the whole prompt set
+    inputs = tokenizer(prompts, return_tensors='pt', padding=True)
+    began = time.perf_counter()
+    with torch.no_grad():
+        model.generate(**inputs, **greedy)
+    batched = time.perf_counter() - began
+
+    print(json.dumps({
+        "backend": backend,
+        "threads": [torch.get_num_threads(), torch.get_num_interop_threads()],
+        "load_s": load_time,
+        "latency_ms": statistics.median(latencies) * 1000,
+        "throughput_tok_s": len(prompts) * NEW_TOKENS / batched,
+        "peak_rss_mb": _peak_rss_mb(),
+        "continuations": continuations,
+    }))
+
+
+def _token_agreement(reference, candidate):
+    matched = total = 0
+    for ref, cand in zip(reference, candidate):
+        for a, b in zip(ref, cand):
+            total += 1
+            if a != b:
+                break  # Later tokens are conditioned on a different prefix
+            matched += 1
+        total += len(ref) - min(len(ref), len(cand))
+    return matched / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="fp32,bf16,int8")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--intra-op-threads", type=int)
+    parser.add_argument("--inter-op-threads", type=int)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeats)
+        return
+
+    env = dict(os.environ)
+    if args.intra_op_threads:
+        env['CAPTION_INTRA_OP_THREADS'] = str(args.intra_op_threads)
+    if args.inter_op_threads:
+        env['CAPTION_INTER_OP_THREADS'] = str(args.inter_op_threads)
+
+    results = {}
+    for backend in args.backends.split(','):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_backends", "--worker", backend, "--repeats", str(args.repeats)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results[backend] = json.loads(out.strip().splitlines()[-1])
+
+    reference = results.get('fp32', {}).get('continuations')
+    print(f"{'backend':<8} {'threads':>8} {'load s':>7} {'ms/prompt':>10} {'tok/s':>8} {'peak MB':>8} {'match fp32':>11}")
+    for backend, result in results.items():
+        drift = f"{_token_agreement(reference, result['continuations']):.1%}" if reference else "n/a"
+        threads = "/".join(str(t) for t in result['threads'])
+        print(
+            f"{backend:<8} {threads:>8} {result['load_s']:>7.2f} {result['latency_ms']:>10.1f} "
+            f"{result['throughput_tok_s']:>8.1f} {result['peak_rss_mb']:>8.0f} {drift:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
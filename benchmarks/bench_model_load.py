@@ -0,0 +1,88 @@
+"""
+Model load time and per-process memory, copied versus memory-mapped weights.
+
+For each loading mode --processes fresh interpreters call ``load_model``
+(including the warm-up generation) at the same time and stay alive until
+all of them have loaded, so their memory is measured while they coexist.
+Reported per mode: median load and warm-up time, and per-process unique
+(private) and shared memory plus PSS from ``/proc/self/smaps_rollup``. With
+``mmap`` the weights are shared page-cache pages, so unique memory per
+process drops and total PSS grows far less with every extra process. The
+run fails if the mmap mode ends up with copied weights, since its numbers
+would then just repeat the copy mode's.
+
+The model must be a local directory with safetensors weights (``python
+prepare.py`` writes one; ``--model stub`` builds a tiny one).
+
+Run from the repository root:
+    python -m benchmarks.bench_model_load --processes 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys
+import caption_generator
+caption_generator.load_model()
+print(json.dumps(caption_generator.load_stats()), flush=True)
+sys.stdin.readline()
+print(json.dumps(caption_generator.load_stats()), flush=True)
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_mode(mmap, processes):
+    env = dict(os.environ, CAPTION_MMAP_WEIGHTS='1' if mmap else '0', CAPTION_OFFLINE='1', CAPTION_WORKERS='0')
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-c", PROBE], cwd=ROOT, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        for _ in range(processes)
+    ]
+    loaded = [json.loads(child.stdout.readline()) for child in children]
+    # Every process is loaded now; measure them side by side
+    for child in children:
+        child.stdin.write("\n")
+        child.stdin.flush()
+    together = [json.loads(child.stdout.readline()) for child in children]
+    for child in children:
+        child.wait()
+    return loaded, together
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real"], default="real")
+    parser.add_argument("--processes", type=int, default=4, help="Processes loading the model at once")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        use_stub_model()
+
+    print(f"{args.processes} processes per mode, model={os.environ.get('CAPTION_MODEL', 'gpt2')}")
+    print(f"{'mode':<8} {'weights':>8} {'load s':>7} {'warm s':>7} {'unique MiB':>11} {'shared MiB':>11} "
+          f"{'PSS MiB':>8} {'total PSS':>10}")
+    for mmap in (False, True):
+        loaded, together = run_mode(mmap, args.processes)
+        memory = [stats['memory'] for stats in together]
+        print(
+            f"{'mmap' if mmap else 'copy':<8} {loaded[0].get('weights', '-'):>8} "
+            f"{statistics.median(s.get('load_s', 0) for s in loaded):>7.2f} "
+            f"{statistics.median(s.get('warmup_s', 0) for s in loaded):>7.2f} "
+            f"{statistics.median(m['unique'] for m in memory):>11.0f} "
+            f"{statistics.median(m['shared'] for m in memory):>11.0f} "
+            f"{statistics.median(m['pss'] for m in memory):>8.0f} {sum(m['pss'] for m in memory):>10.0f}"
+        )
+        if mmap and any(stats.get('weights') != 'mmap' for stats in loaded):
+            sys.exit("CAPTION_MMAP_WEIGHTS=1 loaded copied weights; see the load warning above")
+
+
+if __name__ == "__main__":
+    main()
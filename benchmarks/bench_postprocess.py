@@ -0,0 +1,124 @@
+"""
+Equivalence check and throughput of caption post-processing.
+
+Generates large batches of synthetic raw model output (sentences of mixed
+case, runs of ``.!?``, stray whitespace, captions far over the length cap),
+checks that CaptionPostProcessor produces exactly what the previous
+per-rule implementation produced, including the CTAs picked by a seeded rng,
+and compares their per-caption cost.
+
+Run from the repository root:
+    python -m benchmarks.bench_postprocess --items 100000
+"""
+import argparse
+import random
+import re
+import string
+import sys
+import time
+
+from caption_generator import CTA_TEMPLATES, MAX_REASONABLE_LENGTH, POSTPROCESSOR
+
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook", "Threads"]
+
+
+def _legacy_clean(text):
+    """The cleaning generate_caption did before CaptionPostProcessor"""
+    caption = text.strip()
+    end_patterns = [r'\. [A-Z].*', r'\? [A-Z].*', r'! [A-Z].*']
+    for pattern in end_patterns:
+        match = re.search(pattern, caption)
+        if match:
+            caption = caption[:match.start() + 1]
+            break
+    sentences = re.split(r'[.!?]+', caption)
+    if len(sentences) > 1 and sentences[-1].strip() and not sentences[-1].strip().endswith(('.', '!', '?')):
+        caption = '. '.join(sentences[:-1]) + '.'
+    elif not caption.endswith(('.', '!', '?')):
+        caption = caption.rstrip() + '.'
+    if len(caption) > MAX_REASONABLE_LENGTH:
+        first_sentence_end = min(
+            caption.find('.') if caption.find('.') != -1 else len(caption),
+            caption.find('!') if caption.find('!') != -1 else len(caption),
+            caption.find('?') if caption.find('?') != -1 else len(caption)
+        )
+        if first_sentence_end < len(caption):
+            caption = caption[:first_sentence_end + 1]
+        else:
+            caption = caption[:MAX_REASONABLE_LENGTH].rsplit(' ', 1)[0] + '.'
+    return caption
+
+
+def _legacy_add_cta(caption, platform, include_cta, rng):
+    if include_cta and platform in CTA_TEMPLATES:
+        cta = rng.choice(CTA_TEMPLATES[platform])
+        if len(caption + " " + cta) <= MAX_REASONABLE_LENGTH:
+            caption += " " + cta
+    return caption
+
+
+def _raw_generation(rng):
+    """One synthetic continuation, biased towards the edge cases of the rules"""
+    parts = []
+    for _ in range(rng.randint(0, 40)):
+        roll = rng.random()
+        if roll < 0.55:
+            word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 9)))
+            parts.append(word.capitalize() if rng.random() < 0.2 else word)
+        elif roll < 0.75:
+            parts.append(''.join(rng.choice('.!?') for _ in range(rng.randint(1, 3))))
+        elif roll < 0.9:
+            parts.append(rng.choice([' ', '  ', '\n', ' \t']))
+        else:
+            parts.append(rng.choice(['🔥', 'é', '#tag', '@user', '...', '—', 'Über']))
+        parts.append(' ' if rng.random() < 0.7 else '')
+    text = ''.join(parts)
+    if rng.random() < 0.1:
+        text = text * rng.randint(2, 12)  # Rambling, well over the length cap
+    return text
+
+
+def _per_item_us(fn, items):
+    start = time.perf_counter()
+    fn(items)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000, help="Raw generations per batch")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = [_raw_generation(rng) for _ in range(args.items)]
+
+    mismatches = 0
+    for platform in PLATFORMS:
+        include_cta = platform != "Facebook"
+        legacy_rng, new_rng = random.Random(args.seed), random.Random(args.seed)
+        expected = [_legacy_add_cta(_legacy_clean(text), platform, include_cta, legacy_rng) for text in texts]
+        actual = POSTPROCESSOR.process(texts, platform, include_cta, new_rng)
+        for text, want, got in zip(texts, expected, actual):
+            if want != got:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"MISMATCH on {text!r}:\n  legacy: {want!r}\n  new:    {got!r}")
+    print(f"equivalence: {len(texts) * len(PLATFORMS) - mismatches}/{len(texts) * len(PLATFORMS)} captions identical")
+
+    legacy = _per_item_us(lambda items: [_legacy_clean(text) for text in items], texts)
+    compiled = _per_item_us(POSTPROCESSOR.clean_all, texts)
+    print(f"clean:   legacy {legacy:.2f} us/caption, compiled {compiled:.2f} us/caption ({legacy / compiled:.1f}x)")
+
+    legacy = _per_item_us(
+        lambda items: [_legacy_add_cta(_legacy_clean(text), "Instagram", True, random) for text in items], texts
+    )
+    compiled = _per_item_us(lambda items: POSTPROCESSOR.process(items, "Instagram", True), texts)
+    print(f"process: legacy {legacy:.2f} us/caption, compiled {compiled:.2f} us/caption ({legacy / compiled:.1f}x)")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Prompt-processing time per call with and without the cached tone prefixes.
+
+For every tone this times the prefill forward pass over the full prompt
+against encoding only the keyword suffix on top of a copy of the
+precomputed prefix KV cache, on CPU.
+
+Run from the repository root:
+    python -m benchmarks.bench_prefix_cache --repeats 50
+"""
+import argparse
+import statistics
+import time
+
+import torch
+
+from caption_generator import TONE_TEMPLATES, build_prompt, load_model
+from prefix_cache import PrefixCache
+
+
+def _median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", default="morning coffee routine")
+    parser.add_argument("--batch-size", type=int, default=1, help="Rows per call, as for caption variations")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    generator = load_model()
+    if generator is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+    model, tokenizer = generator.model, generator.tokenizer
+    prefixes = PrefixCache(model, tokenizer, TONE_TEMPLATES)
+
+    print(f"{'tone':<14} {'prefix tok':>10} {'full ms':>9} {'cached ms':>10} {'saved':>7}")
+    for tone in TONE_TEMPLATES:
+        prompt = build_prompt(args.keywords, tone)
+        full_ids = tokenizer(prompt, return_tensors='pt')['input_ids'].expand(args.batch_size, -1)
+
+        def full_prefill():
+            with torch.no_grad():
+                model(input_ids=full_ids, use_cache=True)
+
+        def cached_prefill():
+            input_ids = prefixes.encode(tone, prompt).expand(args.batch_size, -1)
+            past = prefixes.past_for_batch(tone, args.batch_size)
+            suffix_ids = input_ids[:, prefixes.prefix_length(tone):]
+            with torch.no_grad():
+                model(input_ids=suffix_ids, past_key_values=past, use_cache=True)
+
+        full_prefill()
+        cached_prefill()
+        full = _median_ms(full_prefill, args.repeats)
+        cached = _median_ms(cached_prefill, args.repeats)
+        print(f"{tone:<14} {prefixes.prefix_length(tone):>10} {full:>9.2f} {cached:>10.2f} {1 - cached / full:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
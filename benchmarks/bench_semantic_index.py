@@ -0,0 +1,96 @@
+"""
+Build, load and query the semantic hashtag/emoji index end to end.
+
+Builds the index the way ``python prepare.py`` does (prepare_semantic_index,
+with a few extra hashtags) into a temporary resource directory, loads it
+through caption_generator like the app does, and checks that known queries
+rank the expected labels first. Reports build and load time and per-query
+search latency, single and batched. Exits non-zero if a check fails.
+
+``--model stub`` uses the tiny random GPT-2. Its embeddings carry no meaning,
+so only labels that share words with the query can rank first; the checks
+are chosen so that they hold for it and for ``--model real``.
+
+Run from the repository root:
+    python -m benchmarks.bench_semantic_index --model stub
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+EXTRA_HASHTAGS = ["#CoffeeLover", "#MorningCoffee", "#LatteArt", "#BeachLife", "#GymTime"]
+
+# (kind, query, labels that must fill the top len(labels) places, in any order)
+CHECKS = [
+    ('hashtags', "coffee", {"#CoffeeLover", "#MorningCoffee"}),
+    ('hashtags', "morning coffee", {"#MorningCoffee"}),
+    ('hashtags', "travel", {"#Travel"}),
+    ('hashtags', "gym workout", {"#Gym", "#GymTime", "#Workout"}),
+    ('emojis', "hot beverage", {"☕"}),
+    ('emojis', "airplane", {"✈️"}),
+    ('emojis', "pizza", {"🍕"}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real"], default="stub")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries timed per kind")
+    args = parser.parse_args()
+
+    resource_dir = tempfile.mkdtemp(prefix='caption-semantic-')
+    os.environ['CAPTION_RESOURCE_DIR'] = resource_dir
+    if args.model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        use_stub_model()
+
+    import caption_generator
+    import prepare
+
+    tags_path = os.path.join(resource_dir, 'hashtags.txt')
+    with open(tags_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(EXTRA_HASHTAGS))
+
+    start = time.perf_counter()
+    prepare.prepare_semantic_index(caption_generator.model_source(), tags_path)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index = caption_generator._semantic_index()
+    load = time.perf_counter() - start
+    if index is None:
+        raise SystemExit("Semantic index could not be loaded")
+    print(f"model={args.model}: built in {build:.2f}s, loaded in {load * 1000:.1f} ms")
+
+    failed = 0
+    for kind, query, expected in CHECKS:
+        labels = [label for label, _ in index.search_one(kind, query, k=max(3, len(expected)))]
+        ok = set(labels[:len(expected)]) == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {kind:<9} {query!r:<16} -> {' '.join(labels)}")
+    # The suggestion API merges semantic matches into its results
+    hashtags = caption_generator.suggest_hashtags("morning coffee", "Instagram")
+    ok = "#MorningCoffee" in hashtags
+    failed += not ok
+    print(f"{'ok' if ok else 'FAIL':<5} suggest_hashtags('morning coffee') -> {' '.join(hashtags)}")
+
+    queries = [query for _, query, _ in CHECKS] * (args.queries // len(CHECKS) + 1)
+    queries = queries[:args.queries]
+    for kind in index.labels:
+        start = time.perf_counter()
+        for query in queries:
+            index.search_one(kind, query)
+        single = (time.perf_counter() - start) / len(queries) * 1e6
+        start = time.perf_counter()
+        index.search(kind, queries)
+        batched = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"{kind} ({len(index.labels[kind])} labels): {single:.1f} us/query single, "
+              f"{batched:.1f} us/query batched")
+
+    if failed:
+        sys.exit(f"{failed} of {len(CHECKS) + 1} checks failed")
+
+
+if __name__ == "__main__":
+    main()
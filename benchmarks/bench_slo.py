@@ -0,0 +1,141 @@
+"""
+Tail latency under overload with and without the latency-SLO router.
+
+First measures model capacity (captions/s with one caller), then offers
+open-loop Poisson load at multiples of it for --duration seconds: every
+request starts at its scheduled arrival time whether or not earlier ones have
+finished, and latency is measured from that arrival. Each load level runs
+once with routing off (everything waits for the model) and once with an
+``SLORouter`` at --slo-ms. Reported per run: p50/p99/max latency and the
+share of requests answered by the model, a recent cached result, or a
+template.
+
+``--model stub`` runs against the tiny random GPT-2 (fast, so raise --loads);
+use ``--model real`` for realistic numbers. ``--model simulated`` replaces
+the model call with a fixed --simulated-ms sleep on the inference thread, so
+queueing and routing run for real against a model of known speed.
+
+Run from the repository root:
+    python -m benchmarks.bench_slo --model real --slo-ms 1500 --loads 0.5,1,2,4
+    python -m benchmarks.bench_slo --model simulated --simulated-ms 50 --slo-ms 300 --loads 4
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.suite import percentile
+
+KEYWORDS = ["morning coffee", "travel adventure", "team success", "fitness goals", "new tech launch", "healthy food"]
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook"]
+
+
+def _request(rng, tones):
+    return rng.choice(KEYWORDS), rng.choice(PLATFORMS), rng.choice(tones)
+
+
+def use_simulated_model(ms):
+    """Make every in-process model call take ``ms`` milliseconds and return a fixed caption"""
+    import caption_generator
+
+    def generate_missing(generator, requests, missing, results, n, seed):
+        started = time.perf_counter()
+        time.sleep(ms / 1000)
+        for i in missing:
+            results[i] = [f"Simulated caption about {requests[i][0]}."] * n
+        return time.perf_counter() - started
+
+    caption_generator.load_model = lambda: "simulated"
+    caption_generator._generate_missing = generate_missing
+
+
+def measure_capacity(requests):
+    from caption_generator import generate_caption
+
+    start = time.perf_counter()
+    for keywords, platform, tone in requests:
+        generate_caption(keywords, platform, tone)
+    return len(requests) / (time.perf_counter() - start)
+
+
+def offer_load(rate, duration, router, tones, seed=0):
+    import caption_generator
+
+    caption_generator._router_holder['router'] = router
+    rng = random.Random(seed)
+    latencies, lock = [], threading.Lock()
+
+    def call(arrival, request):
+        caption_generator.generate_caption(*request)
+        with lock:
+            latencies.append(time.perf_counter() - arrival)
+
+    # Enough threads that no request waits for a free one
+    with ThreadPoolExecutor(max_workers=max(32, int(rate * duration))) as executor:
+        start = time.perf_counter()
+        arrival = start
+        while arrival < start + duration:
+            arrival += rng.expovariate(rate)
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(call, arrival, _request(rng, tones))
+    result = {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+        "requests": len(latencies),
+    }
+    if router is not None:
+        result.update(router.stats())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real", "simulated"], default="real")
+    parser.add_argument("--simulated-ms", type=float, default=50.0, help="Model call time with --model simulated")
+    parser.add_argument("--slo-ms", type=float, default=1500.0)
+    parser.add_argument("--loads", default="0.5,1,2,4", help="Offered load as multiples of measured capacity")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per run")
+    parser.add_argument("--capacity-requests", type=int, default=20, help="Sequential calls used to measure capacity")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        use_stub_model()
+    elif args.model == "simulated":
+        use_simulated_model(args.simulated_ms)
+    os.environ['CAPTION_WORKERS'] = '0'
+
+    from caption_generator import TONE_TEMPLATES, load_model
+    from slo_router import SLORouter
+
+    if load_model() is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+    tones = list(TONE_TEMPLATES)
+    rng = random.Random(1)
+    capacity = measure_capacity([_request(rng, tones) for _ in range(args.capacity_requests)])
+    print(f"model={args.model}, capacity {capacity:.2f} captions/s, SLO {args.slo_ms:.0f} ms, {args.duration:.0f}s per run")
+    print(f"{'load':>5} {'router':>6} {'reqs':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'model':>6} {'cache':>6} {'templ':>6}")
+    for load in (float(x) for x in args.loads.split(',')):
+        for router in (None, SLORouter(args.slo_ms)):
+            result = offer_load(capacity * load, args.duration, router, tones)
+            paths = ("model", "cache", "fallback")
+            if router is not None:
+                # Coalesced duplicates share one routing decision
+                total = sum(result[path] for path in paths) or 1
+                shares = [result[path] / total for path in paths]
+            else:
+                shares = [1.0, 0.0, 0.0]
+            print(
+                f"{load:>4.1f}x {'on' if router else 'off':>6} {result['requests']:>5} {result['p50_ms']:>8.0f} "
+                f"{result['p99_ms']:>8.0f} {result['max_ms']:>8.0f} "
+                + ' '.join(f"{share:>6.0%}" for share in shares)
+            )
+
+
+if __name__ == "__main__":
+    main()
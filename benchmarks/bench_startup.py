@@ -0,0 +1,72 @@
+"""
+Cold-start budget check.
+
+Times ``import caption_generator`` and the first ``suggest_hashtags`` call in
+fresh interpreters with ``CAPTION_OFFLINE=1`` and exits non-zero when the
+median exceeds its budget or when the import pulled in torch/transformers.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --import-budget 0.3 --first-call-budget 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import caption_generator
+imported = time.perf_counter()
+heavy = sorted(m for m in ("torch", "transformers", "streamlit") if m in sys.modules)
+caption_generator.suggest_hashtags("morning coffee routine", "Instagram")
+first_call = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "first_call": first_call - imported,
+    "heavy_modules": heavy,
+}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_probe():
+    env = dict(os.environ, CAPTION_OFFLINE="1")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=0.3, help="Seconds allowed for the import")
+    parser.add_argument("--first-call-budget", type=float, default=1.0, help="Seconds allowed for the first suggest_hashtags call")
+    args = parser.parse_args()
+
+    probes = [run_probe() for _ in range(args.runs)]
+    import_time = statistics.median(p["import"] for p in probes)
+    first_call = statistics.median(p["first_call"] for p in probes)
+    heavy = sorted(set(m for p in probes for m in p["heavy_modules"]))
+
+    print(f"import caption_generator: {import_time * 1000:.1f} ms (budget {args.import_budget * 1000:.0f} ms)")
+    print(f"first suggest_hashtags:   {first_call * 1000:.1f} ms (budget {args.first_call_budget * 1000:.0f} ms)")
+
+    failures = []
+    if import_time > args.import_budget:
+        failures.append("import over budget")
+    if first_call > args.first_call_budget:
+        failures.append("first suggest_hashtags call over budget")
+    if heavy:
+        failures.append(f"import pulled in {', '.join(heavy)}")
+    if failures:
+        sys.exit("FAIL: " + "; ".join(failures))
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
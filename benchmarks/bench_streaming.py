@@ -0,0 +1,46 @@
+"""
+Time-to-first-token and total latency for streamed captions, next to the
+latency of a blocking generate_caption call.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming --repeats 10
+"""
+import argparse
+import statistics
+import time
+
+from caption_generator import TONE_TEMPLATES, generate_caption, load_model, stream_caption
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", default="morning coffee routine")
+    parser.add_argument("--platform", default="Instagram")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    if load_model() is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+    generate_caption(args.keywords, args.platform, "Casual")
+
+    print(f"{'tone':<14} {'TTFT ms':>8} {'stream total ms':>16} {'blocking ms':>12}")
+    for tone in TONE_TEMPLATES:
+        ttft, total, blocking = [], [], []
+        for _ in range(args.repeats):
+            stream = stream_caption(args.keywords, args.platform, tone)
+            for _ in stream:
+                pass
+            ttft.append(stream.time_to_first_token)
+            total.append(stream.total_latency)
+
+            start = time.perf_counter()
+            generate_caption(args.keywords, args.platform, tone)
+            blocking.append(time.perf_counter() - start)
+        print(
+            f"{tone:<14} {statistics.median(ttft) * 1000:>8.1f} {statistics.median(total) * 1000:>16.1f} "
+            f"{statistics.median(blocking) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Per-item cost of hashtag/emoji key matching as the mapping tables grow.
+
+Compares the old per-request scan over every table key with the compiled
+KeywordIndex on synthetic tables of increasing size, then times the batch
+suggestion APIs on the real tables and, when a semantic index has been
+built (prepare.py), per-query versus batched embedding retrieval.
+
+Run from the repository root:
+    python -m benchmarks.bench_suggestions --sizes 10,1000,10000,50000
+"""
+import argparse
+import random
+import string
+import time
+
+from caption_generator import _semantic_index, suggest_emojis_batch, suggest_hashtags_batch
+from keyword_index import KeywordIndex
+
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook"]
+
+
+def _word(rng, low=4, high=10):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+
+def _naive(table, keywords):
+    """The matching the suggesters did before the index: scan every key"""
+    text = keywords.lower()
+    topics = [key for key in table if key in text]
+    emojis = [key for word in text.split() for key in table if key in word or word in key]
+    return topics, emojis
+
+
+def _indexed(index, keywords):
+    text = keywords.lower()
+    topics = index.keys_in(text)
+    emojis = [i for word in text.split() for i in index.related_keys(word)]
+    return topics, emojis
+
+
+def _per_item_us(fn, inputs):
+    start = time.perf_counter()
+    for keywords in inputs:
+        fn(keywords)
+    return (time.perf_counter() - start) / len(inputs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000,50000", help="Table sizes (number of topic keys)")
+    parser.add_argument("--items", type=int, default=2000, help="Inputs matched per table size")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'topics':>8} {'build ms':>9} {'scan us/item':>13} {'index us/item':>14}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        table = {}
+        while len(table) < size:
+            table[_word(rng)] = ["#" + _word(rng)]
+        keys = list(table)
+        inputs = [
+            " ".join(rng.choice(keys) if rng.random() < 0.3 else _word(rng) for _ in range(rng.randint(2, 5)))
+            for _ in range(args.items)
+        ]
+
+        start = time.perf_counter()
+        index = KeywordIndex(table)
+        build = (time.perf_counter() - start) * 1000
+
+        # Keep the slow path affordable on large tables
+        scan_inputs = inputs[:max(20, args.items * 1000 // max(size, 1000))]
+        scan = _per_item_us(lambda keywords: _naive(table, keywords), scan_inputs)
+        indexed = _per_item_us(lambda keywords: _indexed(index, keywords), inputs)
+        print(f"{size:>8} {build:>9.1f} {scan:>13.1f} {indexed:>14.1f}")
+
+    items = [(f"{_word(rng)} travel coffee {_word(rng)}", rng.choice(PLATFORMS)) for _ in range(args.items)]
+    suggest_hashtags_batch(items[:10])
+    for name, fn in (("suggest_hashtags_batch", suggest_hashtags_batch), ("suggest_emojis_batch", suggest_emojis_batch)):
+        start = time.perf_counter()
+        fn(items)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {elapsed / len(items) * 1e6:.1f} us/item over {len(items)} items")
+
+    index = _semantic_index()
+    if index is None:
+        print("No semantic index built; skipping embedding retrieval")
+        return
+    queries = [keywords for keywords, _ in items]
+    for kind, labels in index.labels.items():
+        start = time.perf_counter()
+        for query in queries[:200]:
+            index.search_one(kind, query)
+        single = (time.perf_counter() - start) / min(200, len(queries)) * 1e6
+        start = time.perf_counter()
+        index.search(kind, queries)
+        batched = (time.perf_counter() - start) / len(queries) * 1e6
+        print(f"semantic {kind} ({len(labels)} labels): {single:.1f} us/query single, {batched:.1f} us/query batched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Wasted tokens per caption and latency, with and without sentence-boundary
+stopping.
+
+"Wasted" tokens are decoded by the model and then removed by post-processing.
+The baseline run disables the stopping criterion, so every row decodes up to
+the MAX_NEW_TOKENS cap as generation did before.
+
+Run from the repository root:
+    python -m benchmarks.bench_token_budget --captions 20
+"""
+import argparse
+import time
+
+import torch
+
+import caption_generator
+import metrics
+import stopping
+
+
+def _run(args):
+    caption_generator._generation_stats.update(captions=0, generated_tokens=0, kept_tokens=0)
+    start = time.perf_counter()
+    for tone in caption_generator.TONE_TEMPLATES:
+        for _ in range(args.captions):
+            caption_generator.generate_caption(args.keywords, args.platform, tone, include_cta=False)
+    elapsed = time.perf_counter() - start
+    stats = caption_generator.generation_stats()
+    return stats, elapsed / max(1, stats['captions'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", default="morning coffee routine")
+    parser.add_argument("--platform", default="Twitter")
+    parser.add_argument("--captions", type=int, default=20, help="Captions per tone")
+    args = parser.parse_args()
+
+    # Token accounting is only kept while metrics are enabled
+    metrics.enable()
+    if caption_generator.load_model() is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+
+    print(f"{'mode':<16} {'gen tok/cap':>11} {'kept tok/cap':>12} {'wasted/cap':>10} {'ms/cap':>8}")
+    original_call = stopping.SentenceBudgetStopping.__call__
+    for mode in ("no early stop", "sentence stop"):
+        if mode == "no early stop":
+            stopping.SentenceBudgetStopping.__call__ = (
+                lambda self, input_ids, scores, **kwargs: torch.zeros(input_ids.shape[0], dtype=torch.bool)
+            )
+        else:
+            stopping.SentenceBudgetStopping.__call__ = original_call
+        stats, latency = _run(args)
+        captions = max(1, stats['captions'])
+        print(
+            f"{mode:<16} {stats['generated_tokens'] / captions:>11.1f} {stats['kept_tokens'] / captions:>12.1f} "
+            f"{stats['wasted_tokens_per_caption']:>10.1f} {latency * 1000:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
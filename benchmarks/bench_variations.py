@@ -0,0 +1,53 @@
+"""
+Per-variation CPU latency: one generate_caption call per variation (the old
+app loop) versus a single batched generate_captions call.
+
+Run from the repository root:
+    python -m benchmarks.bench_variations --repeats 5
+"""
+import argparse
+import statistics
+import time
+
+from caption_generator import generate_caption, generate_captions, load_model
+
+
+def _time(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keywords", default="morning coffee routine")
+    parser.add_argument("--platform", default="Instagram")
+    parser.add_argument("--tone", default="Casual")
+    parser.add_argument("--max-variations", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if load_model() is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+
+    # Warm up so the first timed call does not pay for lazy initialisation
+    generate_captions(args.keywords, args.platform, args.tone, 1)
+
+    print(f"{'n':>3} {'loop ms/var':>12} {'batched ms/var':>15} {'speedup':>8}")
+    for n in range(1, args.max_variations + 1):
+        loop = _time(
+            lambda: [generate_caption(args.keywords, args.platform, args.tone) for _ in range(n)],
+            args.repeats,
+        )
+        batched = _time(
+            lambda: generate_captions(args.keywords, args.platform, args.tone, n),
+            args.repeats,
+        )
+        print(f"{n:>3} {loop / n * 1000:>12.1f} {batched / n * 1000:>15.1f} {loop / batched:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
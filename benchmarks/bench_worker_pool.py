@@ -0,0 +1,97 @@
+"""
+Caption throughput versus worker-process count.
+
+For each worker count a fresh WorkerPool is started (torch threads per
+worker = CPU count / workers unless --threads-per-worker is given), warmed
+up, and then fed --requests single-caption jobs at once. Reported per
+setting: pool start-up time, captions per second, speedup over one worker,
+and p50/p99 job latency. Unseeded requests are used so the generation cache
+never answers for the model.
+
+``--model stub`` runs against the tiny random GPT-2 so the numbers reflect
+scheduling and process overhead; use ``--model real`` on a many-core box to
+see how far the real model scales.
+
+Run from the repository root:
+    python -m benchmarks.bench_worker_pool --workers 1,2,4,8 --requests 128
+"""
+import argparse
+import os
+import time
+
+from benchmarks.suite import percentile
+
+KEYWORDS = ["morning coffee routine", "travel adventure", "team success", "fitness goals", "new tech launch"]
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook"]
+TONES = ["Casual", "Professional", "Inspirational", "Humorous", "Educational"]
+
+
+def _requests(count):
+    return [
+        (KEYWORDS[i % len(KEYWORDS)], PLATFORMS[i % len(PLATFORMS)], TONES[i % len(TONES)], True)
+        for i in range(count)
+    ]
+
+
+def measure(workers, threads, requests, pin_cores):
+    from worker_pool import WorkerPool
+
+    started = time.perf_counter()
+    pool = WorkerPool(workers, threads, pin_cores=pin_cores, chunk_size=1).start(timeout=600)
+    startup = time.perf_counter() - started
+    try:
+        # Warm every worker before timing
+        pool.generate(requests[:workers * 2])
+
+        latencies = []
+        started = time.perf_counter()
+        submitted = [(time.perf_counter(), pool.submit([request])) for request in requests]
+        for submit_time, future in submitted:
+            future.result()
+            latencies.append(time.perf_counter() - submit_time)
+        elapsed = time.perf_counter() - started
+        stats = pool.stats()
+    finally:
+        pool.stop()
+    return {
+        "workers": workers,
+        "threads_per_worker": stats["threads_per_worker"],
+        "startup_s": startup,
+        "captions_per_s": len(requests) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "restarts": stats["restarts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real"], default="stub")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--threads-per-worker", type=int, help="Torch threads per worker (default: CPUs / workers)")
+    parser.add_argument("--requests", type=int, default=128, help="Caption jobs per setting")
+    parser.add_argument("--pin-cores", action="store_true", help="Pin each worker to its own cores")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        use_stub_model()
+    # Each setting gets its own pool; never route through the caption_generator one
+    os.environ['CAPTION_WORKERS'] = '0'
+
+    requests = _requests(args.requests)
+    print(f"{os.cpu_count()} CPUs, {args.requests} requests per setting, model={args.model}")
+    print(f"{'workers':>7} {'threads':>7} {'start s':>8} {'caps/s':>8} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(',')):
+        result = measure(workers, args.threads_per_worker, requests, args.pin_cores)
+        base = base or result["captions_per_s"]
+        print(
+            f"{result['workers']:>7} {result['threads_per_worker']:>7} {result['startup_s']:>8.1f} "
+            f"{result['captions_per_s']:>8.1f} {result['captions_per_s'] / base:>7.2f}x "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
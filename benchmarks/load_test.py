@@ -0,0 +1,129 @@
+"""
+Load test for caption_server: throughput and p50/p99 latency per
+micro-batching setting.
+
+By default an in-process server is started for every combination of
+--batch-sizes and --waits-ms; pass --host/--port to target a running server
+instead. Each run keeps --concurrency keep-alive connections busy for
+--duration seconds.
+
+Run from the repository root:
+    python -m benchmarks.load_test --batch-sizes 1,4,8 --waits-ms 0,10,25 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from caption_generator import TONE_TEMPLATES, load_model
+from caption_server import CaptionServer, MicroBatcher
+
+KEYWORDS = ["morning coffee", "travel adventure", "team success", "fitness goals", "new tech launch", "healthy food"]
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook"]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def _client(host, port, stop_at, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < stop_at:
+            body = json.dumps({
+                "keywords": random.choice(KEYWORDS),
+                "platform": random.choice(PLATFORMS),
+                "tone": random.choice(list(TONE_TEMPLATES)),
+            }).encode('utf-8')
+            start = time.perf_counter()
+            writer.write(
+                b"POST /caption HTTP/1.1\r\nHost: loadtest\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n" % len(body) + body
+            )
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            elif status == 429:
+                await asyncio.sleep(0.05)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, concurrency, duration):
+    latencies, statuses = [], Counter()
+    stop_at = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, stop_at, latencies, statuses) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "ok": statuses[200],
+        "rejected": statuses[429],
+        "errors": sum(count for status, count in statuses.items() if status not in (200, 429)),
+    }
+
+
+async def _in_process(batch_size, wait_ms, args):
+    server = CaptionServer(MicroBatcher(batch_size, wait_ms / 1000, args.max_queue))
+    host, port = await server.start('127.0.0.1', 0)
+    try:
+        result = await run_load(host, port, args.concurrency, args.duration)
+        result["mean_batch"] = server.batcher.stats()["mean_batch_size"]
+        return result
+    finally:
+        await server.stop()
+
+
+def _print_row(label, result):
+    print(
+        f"{label:<16} {result['throughput']:>8.2f} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+        f"{result.get('mean_batch', 0):>6.2f} {result['ok']:>6} {result['rejected']:>6} {result['errors']:>5}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", help="Target an already running server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--waits-ms", default="0,10,25")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per setting")
+    args = parser.parse_args()
+
+    print(f"{'setting':<16} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'batch':>6} {'ok':>6} {'429':>6} {'err':>5}")
+    if args.host:
+        _print_row("external", asyncio.run(run_load(args.host, args.port, args.concurrency, args.duration)))
+        return
+
+    if load_model() is None:
+        raise SystemExit("Model could not be loaded; nothing to benchmark.")
+    for batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        for wait_ms in (float(w) for w in args.waits_ms.split(',')):
+            result = asyncio.run(_in_process(batch_size, wait_ms, args))
+            _print_row(f"b={batch_size} w={wait_ms:g}ms", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Tiny randomly initialised GPT-2 stand-in for offline benchmarks and CI.
+
+The tokenizer is a small byte-level BPE trained on the prompt templates, so
+nothing is downloaded. Generated text is gibberish, but every code path
+(tokenization, batched generate, stopping, post-processing) runs exactly as
+with the real model, only much faster.
+"""
+import os
+import tempfile
+
+STUB_CONFIG = dict(n_positions=256, n_embd=64, n_layer=2, n_head=2)
+EOS = '<|endoftext|>'
+
+
+def _training_text():
+    from caption_generator import CTA_TEMPLATES, TONE_TEMPLATES
+
+    words = "morning coffee routine travel adventure team success fitness food tech business love happy"
+    lines = [template.format(keywords=words) for template in TONE_TEMPLATES.values()]
+    lines += [cta for ctas in CTA_TEMPLATES.values() for cta in ctas]
+    return lines * 20
+
+
+def build_stub_model(directory=None, seed=0):
+    """Write a stub tokenizer and model to ``directory`` (a temp dir by default) and return the path"""
+    import torch
+    from tokenizers import ByteLevelBPETokenizer
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    directory = directory or tempfile.mkdtemp(prefix='caption-stub-model-')
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(_training_text(), vocab_size=512, min_frequency=1, special_tokens=[EOS])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=bpe, eos_token=EOS, bos_token=EOS, unk_token=EOS,
+        model_max_length=STUB_CONFIG['n_positions'],
+    )
+
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=len(tokenizer),
+        bos_token_id=tokenizer.eos_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        **STUB_CONFIG
+    )
+    model = GPT2LMHeadModel(config)
+    tokenizer.save_pretrained(directory)
+    model.save_pretrained(directory, safe_serialization=True)
+    return directory
+
+
+def use_stub_model(directory=None):
+    """Build the stub model and point caption_generator at it via CAPTION_MODEL"""
+    path = build_stub_model(directory)
+    os.environ['CAPTION_MODEL'] = os.path.abspath(path)
+    return path
@@ -0,0 +1,237 @@
+"""
+Benchmark suite for the caption pipeline with regression checking.
+
+Times generate_caption, generate_fallback_caption, suggest_hashtags,
+suggest_emojis and utils.extract_keywords_from_caption and reports p50/p95/p99
+latency, throughput and peak memory per function. ``--model stub`` runs
+against a tiny randomly initialised GPT-2 so the suite works offline and in
+CI; ``--model real`` uses the configured local GPT-2.
+
+Results are written as JSON. When a baseline exists (by default
+benchmarks/baseline_<model>.json) every case is compared against it and the
+run fails if a latency percentile grew, or throughput fell, by more than
+--threshold.
+
+Run from the repository root:
+    python -m benchmarks.suite --model stub --output bench_results.json
+    python -m benchmarks.suite --model stub --save-baseline
+    python -m benchmarks.suite --model stub --require-baseline  # CI: fail without a baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+KEYWORDS = ["morning coffee routine", "travel adventure", "team success", "fitness goals", "new tech launch"]
+PLATFORMS = ["Instagram", "Twitter", "LinkedIn", "Facebook"]
+SAMPLE_CAPTION = (
+    "Started the day with a perfect morning coffee and a quick run by the lake! "
+    "Nothing beats sunrise views #MorningVibes @friend https://example.com/post"
+)
+
+
+def _cases():
+    """Name -> (callable taking an rng, uses the model)"""
+    import utils
+    from caption_generator import (
+        TONE_TEMPLATES,
+        generate_caption,
+        generate_fallback_caption,
+        suggest_emojis,
+        suggest_hashtags,
+    )
+
+    tones = list(TONE_TEMPLATES)
+    return {
+        "generate_caption": (
+            lambda rng: generate_caption(rng.choice(KEYWORDS), rng.choice(PLATFORMS), rng.choice(tones)), True
+        ),
+        "generate_fallback_caption": (
+            lambda rng: generate_fallback_caption(rng.choice(KEYWORDS), rng.choice(PLATFORMS), rng.choice(tones)), False
+        ),
+        "suggest_hashtags": (lambda rng: suggest_hashtags(rng.choice(KEYWORDS), rng.choice(PLATFORMS)), False),
+        "suggest_emojis": (lambda rng: suggest_emojis(rng.choice(KEYWORDS), rng.choice(PLATFORMS)), False),
+        "extract_keywords_from_caption": (lambda rng: utils.extract_keywords_from_caption(SAMPLE_CAPTION), False),
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    # Linear interpolation between closest ranks
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def measure(fn, iterations, warmup, seed=0):
+    """Time ``fn`` and measure its peak Python allocations in a separate pass"""
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        fn(rng)
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        fn(rng)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc slows everything down, so it gets its own short pass
+    tracemalloc.start()
+    for _ in range(min(iterations, 10)):
+        fn(rng)
+    peak_alloc = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_per_s": iterations / elapsed if elapsed else 0.0,
+        "peak_alloc_kb": peak_alloc / 1024,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.05):
+    """
+    Return a list of human-readable regressions against ``baseline``.
+
+    Latency changes smaller than ``min_delta_ms`` are ignored so timer noise on
+    microsecond-scale functions does not fail the run. A case that errors
+    where the baseline succeeded is a regression.
+    """
+    regressions = []
+    for name, case in results["cases"].items():
+        reference = baseline.get("cases", {}).get(name)
+        if not reference or "error" in reference:
+            continue
+        if "error" in case:
+            regressions.append(f"{name}: {case['error']} (succeeded in the baseline)")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if case[metric] > reference[metric] * (1 + threshold) and case[metric] - reference[metric] > min_delta_ms:
+                regressions.append(f"{name}.{metric}: {case[metric]:.3f} vs baseline {reference[metric]:.3f}")
+        slower = 1000 / max(case["throughput_per_s"], 1e-9) - 1000 / max(reference["throughput_per_s"], 1e-9)
+        if case["throughput_per_s"] < reference["throughput_per_s"] * (1 - threshold) and slower > min_delta_ms:
+            regressions.append(
+                f"{name}.throughput_per_s: {case['throughput_per_s']:.1f} vs baseline {reference['throughput_per_s']:.1f}"
+            )
+    return regressions
+
+
+def run(model, iterations, model_iterations, only=None):
+    if model == "stub":
+        from benchmarks.stub_model import use_stub_model
+        use_stub_model()
+    from caption_generator import load_model
+
+    loaded = load_model() is not None
+    if model != "none" and not loaded:
+        raise SystemExit(f"{model} model could not be loaded")
+
+    results = {
+        "model": model,
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "model_source": os.environ.get('CAPTION_MODEL', 'gpt2'),
+        },
+        "cases": {},
+    }
+    for name, (fn, uses_model) in _cases().items():
+        if only and name not in only:
+            continue
+        count = model_iterations if uses_model else iterations
+        try:
+            results["cases"][name] = measure(fn, count, warmup=max(1, count // 10))
+        except Exception as e:
+            results["cases"][name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def _print(results):
+    print(f"{'case':<30} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>10} {'alloc KB':>9} {'RSS MB':>7}")
+    for name, case in results["cases"].items():
+        if "error" in case:
+            print(f"{name:<30} ERROR {case['error']}")
+            continue
+        print(
+            f"{name:<30} {case['p50_ms']:>9.3f} {case['p95_ms']:>9.3f} {case['p99_ms']:>9.3f} "
+            f"{case['throughput_per_s']:>10.1f} {case['peak_alloc_kb']:>9.1f} {case['peak_rss_mb']:>7.0f}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stub", "real", "none"], default="stub",
+                        help="stub: tiny random GPT-2; real: configured GPT-2; none: fallback path only")
+    parser.add_argument("--iterations", type=int, default=2000, help="Iterations for the non-model cases")
+    parser.add_argument("--model-iterations", type=int, default=30, help="Iterations for generate_caption")
+    parser.add_argument("--only", help="Comma-separated case names to run")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Baseline JSON (default: benchmarks/baseline_<model>.json)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore latency changes smaller than this")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="Fail when there is no baseline to compare against (for CI)")
+    args = parser.parse_args(argv)
+
+    if args.model == "none":
+        # Make load_model fail fast so generate_caption takes the fallback path
+        os.environ['CAPTION_MODEL'] = os.path.join(HERE, 'no-such-model')
+        os.environ['CAPTION_OFFLINE'] = '1'
+
+    only = set(args.only.split(',')) if args.only else None
+    results = run(args.model, args.iterations, args.model_iterations, only)
+    _print(results)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    baseline_path = args.baseline or os.path.join(HERE, f"baseline_{args.model}.json")
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    if not os.path.exists(baseline_path):
+        if args.require_baseline:
+            sys.exit(f"No baseline at {baseline_path}; record one with --save-baseline")
+        print(f"No baseline at {baseline_path}; skipping regression check")
+        return
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print("Regressions over {:.0%}:".format(args.threshold))
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
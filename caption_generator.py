@@ -1,52 +1,233 @@
-from transformers import pipeline
-import streamlit as st
+import importlib.util
+import logging
+import os
 import random
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-# Import NLTK
-try:
+import metrics
+import platforms
+from coalescing import InferenceExecutor, SingleFlight
+from postprocess import CaptionPostProcessor
+
+# Heavy dependencies (transformers/torch, NLTK, Streamlit) are imported on
+# first use so that importing this module stays cheap.
+NLTK_AVAILABLE = importlib.util.find_spec('nltk') is not None
+
+# Directory filled by `python prepare.py` with the model and NLTK corpora
+RESOURCE_DIR = os.environ.get(
+    'CAPTION_RESOURCE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+)
+
+# In offline mode nothing is ever downloaded; resources must already be on disk
+OFFLINE_MODE = os.environ.get('CAPTION_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+logger = logging.getLogger(__name__)
+
+def _warn(message):
+    """Show a warning in the Streamlit UI when running there, otherwise log it"""
+    logger.warning(message)
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        try:
+            st.warning(message)
+        except Exception:
+            pass
+
+def _find_or_download(nltk, resources):
+    """Return True once one of the (path, package) NLTK resources is available"""
+    for path, _ in resources:
+        try:
+            nltk.data.find(path)
+            return True
+        except LookupError:
+            pass
+    if OFFLINE_MODE:
+        return False
+    for path, package in resources:
+        try:
+            if nltk.download(package, quiet=True):
+                return True
+        except Exception:
+            pass
+    return False
+
+@lru_cache(maxsize=None)
+def nltk_resources():
+    """
+    Check which NLTK resources can be used, downloading missing ones at most once.
+
+    Local data (including ``RESOURCE_DIR/nltk_data``) is looked up first and
+    nothing is downloaded in offline mode. Returns a dict with a ``stopwords``
+    flag; words are split with ``WORD_PATTERN``, so no NLTK tokenizer is needed.
+    """
+    available = {'stopwords': False}
+    if not NLTK_AVAILABLE:
+        return available
+    
     import nltk
-    from nltk.tokenize import word_tokenize
-    from nltk.corpus import stopwords
-    NLTK_AVAILABLE = True
+    local_dir = os.path.join(RESOURCE_DIR, 'nltk_data')
+    if os.path.isdir(local_dir) and local_dir not in nltk.data.path:
+        nltk.data.path.insert(0, local_dir)
     
-    # Download NLTK data with better error handling
+    available['stopwords'] = _find_or_download(nltk, [('corpora/stopwords', 'stopwords')])
+    return available
+
+def _local_or_hub(name):
+    local_dir = os.path.join(RESOURCE_DIR, 'models', name)
+    return local_dir if os.path.isdir(local_dir) else name
+
+def model_source():
+    """Return the prepared local model directory if there is one, else the hub name"""
+    return _local_or_hub(os.environ.get('CAPTION_MODEL', 'gpt2'))
+
+def draft_source():
+    """Return the draft model for assisted decoding (``CAPTION_DRAFT_MODEL``), or None"""
+    name = os.environ.get('CAPTION_DRAFT_MODEL', '')
+    return _local_or_hub(name) if name else None
+
+# Memory-map local safetensors weights instead of reading them into private
+# memory, so processes on one host share them (see mmap_loader)
+MMAP_WEIGHTS = os.environ.get('CAPTION_MMAP_WEIGHTS', '').lower() in ('1', 'true', 'yes')
+
+def _mmap_model(source):
+    """The model at ``source`` on memory-mapped weights, or None to load it normally"""
+    if not MMAP_WEIGHTS or not os.path.isdir(source):
+        return None
     try:
-        # Try downloading the newer punkt_tab first
-        nltk.download('punkt_tab', quiet=True)
-        nltk.download('stopwords', quiet=True)
-    except:
-        try:
-            # Fallback to older punkt if punkt_tab fails
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-        except:
-            # If downloads fail, we'll use basic processing
-            pass
-            
-except ImportError:
-    NLTK_AVAILABLE = False
+        import mmap_loader
+        return mmap_loader.load_model(source)
+    except Exception as e:
+        logger.warning("Could not memory-map the weights in %s: %s. Loading them normally.", source, e)
+        return None
 
-# Cache the model loading for better performance
-@st.cache_resource
-def load_model():
-    """Load and cache the text generation model"""
+def _load_generator():
     try:
-        import os
         # Set environment variables for better compatibility
         os.environ['TOKENIZERS_PARALLELISM'] = 'false'
-        return pipeline('text-generation', model='gpt2', device=-1, torch_dtype='auto')
+        if OFFLINE_MODE:
+            os.environ['HF_HUB_OFFLINE'] = '1'
+        from transformers import AutoTokenizer, pipeline
+        from inference_backends import apply_backend, backend_from_env, configure_threads
+        
+        backend = backend_from_env()
+        configure_threads()
+        source = model_source()
+        model = _mmap_model(source)
+        if model is not None:
+            generator = pipeline('text-generation', model=model, tokenizer=AutoTokenizer.from_pretrained(source), device=-1)
+        else:
+            generator = pipeline('text-generation', model=source, device=-1, torch_dtype='auto')
+        _load_stats['weights'] = 'mmap' if model is not None else 'copied'
+        generator.model = apply_backend(generator.model, backend)
+        return generator
     except Exception as e:
-        st.warning(f"Could not load AI model: {e}. Using fallback text generation.")
+        _warn(f"Could not load AI model: {e}. Using fallback text generation.")
         return None
 
+# Precompute the KV cache for each tone template's static prefix at load time
+PREFIX_CACHE_ENABLED = os.environ.get('CAPTION_PREFIX_CACHE', '1').lower() not in ('0', 'false', 'no')
+
+def _build_prefix_cache(generator):
+    try:
+        from prefix_cache import PrefixCache
+        return PrefixCache(generator.model, generator.tokenizer, TONE_TEMPLATES)
+    except Exception as e:
+        _warn(f"Could not precompute tone prefixes: {e}. Encoding full prompts.")
+        return None
+
+# Assisted decoding: a small draft model (e.g. distilgpt2, which shares
+# GPT-2's tokenizer) proposes tokens that the main model verifies in one pass
+def _load_draft(generator):
+    source = draft_source()
+    if source is None or generator is None:
+        return None
+    try:
+        from transformers import AutoModelForCausalLM
+        from inference_backends import apply_backend, backend_from_env
+
+        draft = _mmap_model(source)
+        if draft is None:
+            draft = AutoModelForCausalLM.from_pretrained(source, torch_dtype='auto')
+        vocab_size, expected = draft.config.vocab_size, generator.model.config.vocab_size
+        if vocab_size != expected:
+            raise ValueError(f"vocabulary size {vocab_size} does not match the main model's {expected}")
+        draft = apply_backend(draft.eval(), backend_from_env())
+        if os.environ.get('CAPTION_DRAFT_TOKENS'):
+            draft.generation_config.num_assistant_tokens = int(os.environ['CAPTION_DRAFT_TOKENS'])
+        return draft
+    except Exception as e:
+        _warn(f"Could not load draft model {source}: {e}. Using normal decoding.")
+        return None
+
+def _disable_draft(error):
+    _warn(f"Assisted decoding failed: {error}. Using normal decoding.")
+    metrics.count('fallback', reason='draft')
+    _model_cache['draft'] = None
+
+# Run one short generation at load time so the first request does not pay
+# for lazy initialisation (kernel selection, allocator warm-up, page faults)
+WARMUP_ENABLED = os.environ.get('CAPTION_WARMUP', '1').lower() not in ('0', 'false', 'no')
+WARMUP_TOKENS = 8
+
+def _warm_up(generator):
+    import torch
+    
+    try:
+        tokenizer = generator.tokenizer
+        inputs = tokenizer(build_prompt("morning coffee", next(iter(TONE_TEMPLATES))), return_tensors='pt')
+        with torch.no_grad():
+            generator.model.generate(
+                **inputs, max_new_tokens=WARMUP_TOKENS, do_sample=False, pad_token_id=tokenizer.eos_token_id
+            )
+    except Exception as e:
+        _warn(f"Model warm-up failed: {e}")
+
+_model_lock = threading.Lock()
+_model_cache = {}
+_load_stats = {}
+
+# Cache the model loading for better performance; the cache lives as long as
+# the process, so every Streamlit session shares one pipeline
+def load_model():
+    """Load and cache the text generation model"""
+    with _model_lock:
+        if 'generator' not in _model_cache:
+            started = time.perf_counter()
+            with metrics.timer('load_model'):
+                generator = _load_generator()
+            _load_stats['load_s'] = time.perf_counter() - started
+            metrics.count('model_load', result='ok' if generator is not None else 'failed')
+            _model_cache['generator'] = generator
+            prefixes = None
+            if generator is not None and PREFIX_CACHE_ENABLED:
+                with metrics.timer('prefix_cache'):
+                    prefixes = _build_prefix_cache(generator)
+            _model_cache['prefixes'] = prefixes
+            with metrics.timer('load_draft'):
+                _model_cache['draft'] = _load_draft(generator)
+            if generator is not None and WARMUP_ENABLED:
+                started = time.perf_counter()
+                with metrics.timer('warmup'):
+                    _warm_up(generator)
+                _load_stats['warmup_s'] = time.perf_counter() - started
+        return _model_cache['generator']
+
+def load_stats():
+    """
+    Return how the model was loaded: ``weights`` (``mmap`` or ``copied``),
+    ``load_s`` and ``warmup_s``, plus this process's memory in MiB (``rss``,
+    ``pss``, ``unique``, ``shared``).
+    """
+    return dict(_load_stats, memory=metrics.process_memory())
+
 # Platform-specific caption length limits
-PLATFORM_LENGTHS = {
-    "Instagram": 2200,
-    "Twitter": 280,
-    "LinkedIn": 3000,
-    "Facebook": 63206
-}
+PLATFORM_LENGTHS = platforms.PLATFORM_LENGTHS
 
 # Enhanced platform-specific emoji sets
 PLATFORM_EMOJIS = {
@@ -73,9 +254,9 @@ CTA_TEMPLATES = {
     "Facebook": ["Like if you agree! 👍", "Share with your friends! 📤", "What do you think? Comment below! 💬", "Tag someone who would love this! 🏷️"]
 }
 
-def generate_fallback_caption(keywords, platform, tone, include_cta=True):
-    """Generate a simple caption when AI model is not available"""
-    import random
+def generate_fallback_caption(keywords, platform, tone, include_cta=True, rng=None):
+    """Generate a simple caption when AI model is not available; ``rng`` picks the templates"""
+    rng = rng or random
     
     templates = {
         "Casual": [
@@ -106,184 +287,758 @@ def generate_fallback_caption(keywords, platform, tone, include_cta=True):
     }
     
     template_list = templates.get(tone, [f"Sharing my thoughts on {keywords}."])
-    caption = random.choice(template_list)
+    caption = rng.choice(template_list)
     
     if include_cta and platform in CTA_TEMPLATES:
-        cta = random.choice(CTA_TEMPLATES[platform])
+        cta = rng.choice(CTA_TEMPLATES[platform])
         caption += " " + cta
     
     return caption
 
-def generate_caption(keywords, platform, tone, include_cta=True):
+# Sampling parameters shared by every model call
+GENERATION_KWARGS = {
+    "do_sample": True,
+    "temperature": 0.7,  # Lower temperature for more focused output
+    "top_p": 0.9,  # Nucleus sampling for better quality
+    "repetition_penalty": 1.1,  # Avoid repetition
+}
+
+# Maximum caption length we keep, much shorter than platform limits
+MAX_REASONABLE_LENGTH = 300
+
+# Upper bound on sampled tokens; decoding normally stops much earlier, as
+# soon as a complete sentence or the character budget is reached
+MAX_NEW_TOKENS = 40
+
+def char_budget(platform):
+    """Characters of generated text worth decoding for a platform"""
+    return min(platforms.char_limit(platform, MAX_REASONABLE_LENGTH), MAX_REASONABLE_LENGTH)
+
+def _max_new_tokens(tokenizer, prompt_tokens):
+    """Token budget for a prompt of ``prompt_tokens`` tokens"""
+    context = getattr(tokenizer, 'model_max_length', None) or 1024
+    if context > 100000:  # Tokenizers without a known limit report a huge sentinel
+        context = 1024
+    return max(1, min(MAX_NEW_TOKENS, context - prompt_tokens))
+
+def build_prompt(keywords, tone):
+    """Render the tone template for the given keywords"""
+    return TONE_TEMPLATES[tone].format(keywords=keywords)
+
+def _prefix_inputs(prompt, tone, num_return_sequences):
+    """Model inputs that continue from the tone's cached prefix, or None"""
+    import torch
+    
+    prefixes = _model_cache.get('prefixes')
+    if prefixes is None or tone not in prefixes:
+        return None
+    input_ids = prefixes.encode(tone, prompt)
+    if input_ids is None:
+        return None
+    input_ids = input_ids.expand(num_return_sequences, -1)
+    return {
+        'input_ids': input_ids,
+        'attention_mask': torch.ones_like(input_ids),
+        'past_key_values': prefixes.past_for_batch(tone, num_return_sequences),
+    }
+
+def _generate_kwargs(generator, prompts, num_return_sequences=1, tone=None, char_budgets=None, assisted=True):
     """
-    Generate a social media caption based on keywords, platform, and tone.
+    Build the ``model.generate`` keyword arguments for a batch of prompts.
+
+    Prompts are left-padded so every row ends at the same position, and the
+    attention mask keeps the padding out of the computation. A single prompt
+    rendered from ``tone`` continues from that tone's precomputed prefix KV
+    cache, so only the keyword suffix is encoded. Each row stops decoding once
+    it holds a complete sentence or reaches its prompt's entry in
+    ``char_budgets``.
+
+    With a draft model loaded and ``assisted`` set, single-sequence calls use
+    assisted decoding with the same sampling parameters; those encode the
+    full prompt, as the draft model cannot continue from the main model's
+    prefix cache.
+    """
+    from transformers import StoppingCriteriaList
+    from stopping import SentenceBudgetStopping
+
+    tokenizer = generator.tokenizer
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = 'left'
+
+    # transformers only supports assisted decoding for a single sequence
+    single = len(prompts) * num_return_sequences == 1
+    draft = _model_cache.get('draft') if assisted and single else None
+
+    inputs = None
+    repeats = num_return_sequences
+    with metrics.timer('tokenize'):
+        if tone is not None and len(prompts) == 1 and draft is None:
+            inputs = _prefix_inputs(prompts[0], tone, num_return_sequences)
+            if inputs is not None:
+                # Rows are already expanded to match the expanded prefix cache
+                repeats = 1
+        if inputs is None:
+            inputs = tokenizer(prompts, return_tensors='pt', padding=True, truncation=True)
+    metrics.count('tokens', int(inputs['attention_mask'].sum()), kind='prompt')
+
+    input_length = inputs['input_ids'].shape[1]
+    if char_budgets is None:
+        char_budgets = [MAX_REASONABLE_LENGTH] * len(prompts)
+    stopping = SentenceBudgetStopping(
+        tokenizer, input_length,
+        [budget for budget in char_budgets for _ in range(num_return_sequences)]
+    )
+
+    kwargs = dict(
+        inputs,
+        max_new_tokens=_max_new_tokens(tokenizer, int(inputs['attention_mask'].sum(dim=1).max())),
+        num_return_sequences=repeats,
+        pad_token_id=tokenizer.eos_token_id,
+        stopping_criteria=StoppingCriteriaList([stopping]),
+        **GENERATION_KWARGS
+    )
+    if draft is not None:
+        kwargs['assistant_model'] = draft
+    return kwargs
+
+def _generate_texts(generator, prompts, num_return_sequences=1, tone=None, char_budgets=None, assisted=True):
+    """
+    Sample continuations for several prompts in one batched generate call.
+
+    Returns one list of ``num_return_sequences`` continuations (prompt
+    stripped) per prompt. If assisted decoding fails the draft model is
+    dropped and the call is retried with normal decoding.
+    """
+    import torch
+
+    kwargs = _generate_kwargs(generator, prompts, num_return_sequences, tone, char_budgets, assisted)
+    with metrics.timer('generate'), torch.no_grad():
+        try:
+            output = generator.model.generate(**kwargs)
+        except Exception as e:
+            if 'assistant_model' not in kwargs:
+                raise
+            _disable_draft(e)
+            kwargs = _generate_kwargs(generator, prompts, num_return_sequences, tone, char_budgets, False)
+            output = generator.model.generate(**kwargs)
+    input_length = kwargs['input_ids'].shape[1]
+
+    tokenizer = generator.tokenizer
+    new_tokens = output[:, input_length:]
+    texts = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+    _record_generated(int((new_tokens != tokenizer.eos_token_id).sum()))
+    return [
+        texts[i * num_return_sequences:(i + 1) * num_return_sequences]
+        for i in range(len(prompts))
+    ]
+
+# Cleaning rules and CTA placement, compiled once for every generation path
+POSTPROCESSOR = CaptionPostProcessor(CTA_TEMPLATES, MAX_REASONABLE_LENGTH)
+
+_stats_lock = threading.Lock()
+_generation_stats = {'captions': 0, 'generated_tokens': 0, 'kept_tokens': 0}
+
+def _record_generated(tokens):
+    if not metrics.enabled():
+        return
+    with _stats_lock:
+        _generation_stats['generated_tokens'] += tokens
+    metrics.count('tokens', tokens, kind='generated')
+
+def _finish_captions(generator, texts, platform, include_cta=True, rng=random):
+    """
+    Post-process raw continuations and, while metrics are enabled, count the
+    tokens that survive cleaning.
+    """
+    with metrics.timer('postprocess'):
+        cleaned = POSTPROCESSOR.clean_all(texts)
+        captions = POSTPROCESSOR.add_ctas(cleaned, platform, include_cta, rng)
+    if not metrics.enabled():
+        # Counting kept tokens re-tokenizes every caption; skip it on the hot path
+        return captions
+    kept = sum(len(ids) for ids in generator.tokenizer(cleaned)['input_ids'])
+    with _stats_lock:
+        _generation_stats['captions'] += len(cleaned)
+        _generation_stats['kept_tokens'] += kept
+    metrics.count('tokens', kept, kind='kept')
+    return captions
+
+def generation_stats():
+    """
+    Return token accounting for model-generated captions, including the
+    average number of decoded tokens thrown away by post-processing. Only
+    generations made while metrics are enabled are counted.
+    """
+    with _stats_lock:
+        stats = dict(_generation_stats)
+    wasted = max(0, stats['generated_tokens'] - stats['kept_tokens'])
+    stats['wasted_tokens'] = wasted
+    stats['wasted_tokens_per_caption'] = wasted / stats['captions'] if stats['captions'] else 0.0
+    return stats
+
+# Bump whenever prompts, sampling or post-processing change so stale cache
+# entries are never served
+GENERATION_CACHE_VERSION = 3
+
+_cache_lock = threading.Lock()
+_cache_holder = {}
+
+def get_generation_cache():
+    """Return the process-wide generation cache, creating it on first use"""
+    from generation_cache import GenerationCache, cache_from_env
+    
+    with _cache_lock:
+        if 'cache' not in _cache_holder:
+            try:
+                _cache_holder['cache'] = cache_from_env(os.path.join(RESOURCE_DIR, 'generation_cache.sqlite'))
+            except Exception as e:
+                _warn(f"Could not open the on-disk generation cache: {e}. Using memory only.")
+                _cache_holder['cache'] = GenerationCache()
+        return _cache_holder['cache']
+
+def cache_stats():
+    """Return hit/miss counters for the generation cache"""
+    return get_generation_cache().stats()
+
+def _cache_key(request, n, seed):
+    from generation_cache import make_key
+    
+    keywords, platform, tone, include_cta = request
+    return make_key(
+        GENERATION_CACHE_VERSION, model_source(), draft_source(), os.environ.get('CAPTION_BACKEND', 'fp32').lower(),
+        build_prompt(keywords, tone),
+        platform, include_cta, n, seed, GENERATION_KWARGS
+    )
+
+def _fallback_captions(request, n, reason, seed=None):
+    keywords, platform, tone, include_cta = request
+    metrics.count('fallback', n, reason=reason)
+    # A seeded request gets the same templates every time
+    rng = random.Random(seed) if seed is not None else None
+    return [generate_fallback_caption(keywords, platform, tone, include_cta, rng) for _ in range(n)]
+
+def _generate_seeded(generator, request, n, seed):
+    """Generate ``n`` captions for one request, reproducibly from ``seed``"""
+    import torch
+    
+    keywords, platform, tone, include_cta = request
+    # Each request gets its own call so the sample does not depend on what
+    # else happens to be in the batch
+    with torch.random.fork_rng(devices=[]):
+        torch.manual_seed(seed)
+        texts = _generate_texts(
+            generator, [build_prompt(keywords, tone)], num_return_sequences=n,
+            tone=tone, char_budgets=[char_budget(platform)]
+        )[0]
+    return _finish_captions(generator, texts, platform, include_cta, random.Random(seed))
+
+# Concurrent identical generate_captions calls share one flight, and every
+# model call in this process runs on one inference thread
+SINGLE_FLIGHT = SingleFlight()
+INFERENCE = InferenceExecutor()
+
+_pool_lock = threading.Lock()
+_pool_holder = {}
+
+def worker_pool():
+    """
+    Return the process-wide worker pool when ``CAPTION_WORKERS`` is set, else None.
+
+    With a pool, generation runs in the worker processes and this process
+    never loads the model for ``generate_captions_batch`` and its wrappers.
+    """
+    with _pool_lock:
+        if 'pool' not in _pool_holder:
+            pool = None
+            try:
+                from worker_pool import pool_from_env
+                pool = pool_from_env()
+                if pool is not None:
+                    pool.start()
+            except Exception as e:
+                _warn(f"Could not start the caption worker pool: {e}. Generating in-process.")
+                pool = None
+            _pool_holder['pool'] = pool
+        return _pool_holder['pool']
+
+_router_lock = threading.Lock()
+_router_holder = {}
+
+def slo_router():
+    """Return the process-wide latency-SLO router when ``CAPTION_SLO_MS`` is set, else None"""
+    with _router_lock:
+        if 'router' not in _router_holder:
+            from slo_router import router_from_env
+            
+            pool = worker_pool()
+            _router_holder['router'] = router_from_env(pool.workers if pool is not None else 1)
+        return _router_holder['router']
+
+def router_stats():
+    """Return requests per routing path (model, cache, fallback), or None without an SLO"""
+    router = slo_router()
+    return router.stats() if router is not None else None
+
+def _recent_key(request, n, seed):
+    # The seed is part of the key so a seeded request only ever gets its own output back
+    return tuple(request), n, seed
+
+def _shed(router, requests, missing, results, n, seed=None):
+    """Answer requests the model cannot serve within the SLO from recent output or templates"""
+    for i in missing:
+        recent = router.recent.get(_recent_key(requests[i], n, seed))
+        if recent is not None:
+            results[i] = list(recent)
+            router.count('cache')
+        else:
+            results[i] = _fallback_captions(requests[i], n, 'slo', seed)
+            router.count('fallback')
+
+def generate_captions_batch(requests, n=1, seed=None):
+    """
+    Generate captions for many (keywords, platform, tone, include_cta) requests.
+
+    Unseeded prompts are sampled in one batched model call. With a ``seed``
+    the output is reproducible and served from the generation cache when
+    possible. ``n`` captions are returned for each request, in request order.
+    With a latency SLO set, requests the model would answer too late get the
+    latest model output for the same request, or a template caption.
+    """
+    requests = list(requests)
+    results = [None] * len(requests)
+    
+    if seed is not None:
+        cache = get_generation_cache()
+        keys = [_cache_key(request, n, seed) for request in requests]
+        # Copies, so a caller editing its captions cannot change the cache
+        results = [cache.get(key) for key in keys]
+        results = [list(result) if result is not None else None for result in results]
+        hits = sum(result is not None for result in results)
+        metrics.count('cache', hits, event='hit')
+        metrics.count('cache', len(results) - hits, event='miss')
+    
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+    
+    router = slo_router()
+    if router is None:
+        _generate_with_model(requests, missing, results, n, seed)
+        return results
+    if not router.admit(len(missing)):
+        _shed(router, requests, missing, results, n, seed)
+        return results
+    
+    answered, elapsed = False, None
+    try:
+        answered, elapsed = _generate_with_model(requests, missing, results, n, seed)
+    finally:
+        router.release(len(missing), elapsed)
+        # Counted once the outcome is known: a model failure is a fallback
+        router.count('model' if answered else 'fallback', len(missing))
+    if answered:
+        for i in missing:
+            router.recent.put(_recent_key(requests[i], n, seed), tuple(results[i]))
+    return results
+
+def _generate_with_model(requests, missing, results, n, seed):
+    """
+    Fill ``results[i]`` for each index in ``missing`` from the pool or the
+    in-process model, falling back to templates on failure. Returns
+    ``(answered, elapsed)``: whether the model produced the captions, and the
+    seconds it spent generating, or None when the model did not answer or the
+    time says nothing about its speed (workers still loading).
     """
+    pool = worker_pool()
+    if pool is not None:
+        started, warm = time.perf_counter(), pool.ready()
+        try:
+            for i, captions in zip(missing, pool.generate([requests[i] for i in missing], n=n, seed=seed)):
+                results[i] = captions
+        except Exception as e:
+            _warn(f"Caption worker pool failed: {str(e)}. Using fallback method.")
+            for i in missing:
+                if results[i] is None:
+                    results[i] = _fallback_captions(requests[i], n, 'pool', seed)
+            return False, None
+        # Includes time queued in the pool, which the pool does not report
+        return True, time.perf_counter() - started if warm else None
+    
     generator = load_model()
     if not generator:
-        return generate_fallback_caption(keywords, platform, tone, include_cta)
-    
-    # Create prompt
-    prompt = TONE_TEMPLATES[tone].format(keywords=keywords)
-    # Much shorter max length to prevent rambling
-    max_length = min(50, len(prompt.split()) + 25)  # Prompt + ~25 words max
+        for i in missing:
+            results[i] = _fallback_captions(requests[i], n, 'no_model', seed)
+        return False, None
     
     try:
-        # Generate text with more controlled parameters
-        result = generator(
-            prompt, 
-            max_length=max_length, 
-            num_return_sequences=1, 
-            truncation=True,
-            do_sample=True,
-            temperature=0.7,  # Lower temperature for more focused output
-            top_p=0.9,  # Nucleus sampling for better quality
-            repetition_penalty=1.1,  # Avoid repetition
-            pad_token_id=generator.tokenizer.eos_token_id
-        )[0]['generated_text']
-        
-        # Clean the caption more aggressively
-        caption = result.replace(prompt, "").strip()
-        
-        # Remove any text after common ending patterns that indicate rambling
-        end_patterns = [
-            r'\. [A-Z].*',  # Remove anything after first sentence ending
-            r'\? [A-Z].*',  # Remove anything after question
-            r'! [A-Z].*',   # Remove anything after exclamation
-        ]
-        
-        for pattern in end_patterns:
-            match = re.search(pattern, caption)
-            if match:
-                caption = caption[:match.start() + 1]
-                break
+        return True, INFERENCE.run(_generate_missing, generator, requests, missing, results, n, seed)
         
-        # Remove incomplete sentences at the end
-        sentences = re.split(r'[.!?]+', caption)
-        if len(sentences) > 1 and sentences[-1].strip() and not sentences[-1].strip().endswith(('.', '!', '?')):
-            caption = '. '.join(sentences[:-1]) + '.'
-        elif not caption.endswith(('.', '!', '?')):
-            caption = caption.rstrip() + '.'
-        
-        # Aggressive length limiting - if too long, use first sentence only
-        max_reasonable_length = 300  # Much shorter than platform limits
-        if len(caption) > max_reasonable_length:
-            # Find first sentence ending
-            first_sentence_end = min(
-                caption.find('.') if caption.find('.') != -1 else len(caption),
-                caption.find('!') if caption.find('!') != -1 else len(caption),
-                caption.find('?') if caption.find('?') != -1 else len(caption)
-            )
-            if first_sentence_end < len(caption):
-                caption = caption[:first_sentence_end + 1]
-            else:
-                # If no sentence ending found, truncate and add period
-                caption = caption[:max_reasonable_length].rsplit(' ', 1)[0] + '.'
+    except Exception as e:
+        _warn(f"AI generation failed: {str(e)}. Using fallback method.")
+        for i in missing:
+            if results[i] is None:
+                results[i] = _fallback_captions(requests[i], n, 'error', seed)
+        return False, None
+
+def _generate_missing(generator, requests, missing, results, n, seed):
+    """
+    Fill ``results[i]`` for each index in ``missing``; runs on the inference
+    thread and returns the seconds it took.
+    """
+    started = time.perf_counter()
+    if seed is None:
+        prompts = [build_prompt(requests[i][0], requests[i][2]) for i in missing]
+        tones = set(requests[i][2] for i in missing)
+        texts = _generate_texts(
+            generator, prompts, num_return_sequences=n,
+            tone=tones.pop() if len(tones) == 1 else None,
+            char_budgets=[char_budget(requests[i][1]) for i in missing]
+        )
+        for i, variations in zip(missing, texts):
+            _, platform, _, include_cta = requests[i]
+            results[i] = _finish_captions(generator, variations, platform, include_cta)
+    else:
+        cache = get_generation_cache()
+        for i in missing:
+            results[i] = _generate_seeded(generator, requests[i], n, seed)
+            cache.put(_cache_key(requests[i], n, seed), list(results[i]))
+    return time.perf_counter() - started
+
+def generate_captions(keywords, platform, tone, n=1, include_cta=True, seed=None):
+    """
+    Generate ``n`` caption variations with a single batched model call.
+
+    Identical concurrent calls (e.g. a team generating for one campaign)
+    share a single generation instead of each running the model.
+    """
+    key = (keywords, platform, tone, n, include_cta, seed)
+    captions = SINGLE_FLIGHT.run(
+        key, lambda: generate_captions_batch([(keywords, platform, tone, include_cta)], n=n, seed=seed)[0]
+    )
+    return list(captions)
+
+def coalescing_stats():
+    """
+    Return request-coalescing counters (``dedup_ratio``, caller wait times) and
+    how long model calls queued for the inference thread.
+    """
+    stats = SINGLE_FLIGHT.stats()
+    stats['inference'] = INFERENCE.stats()
+    return stats
+
+def generate_caption(keywords, platform, tone, include_cta=True, seed=None):
+    """
+    Generate a social media caption based on keywords, platform, and tone.
+    """
+    return generate_captions(keywords, platform, tone, n=1, include_cta=include_cta, seed=seed)[0]
+
+# Streams that cannot decode token by token here generate the whole caption
+# through generate_captions on one of these threads instead
+STREAM_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='caption-stream')
+
+class CaptionStream:
+    """
+    Iterate over a caption while it is being decoded.
+
+    Each item is the partial caption decoded so far. Once iteration finishes,
+    ``caption`` holds the post-processed caption (with CTA), and
+    ``time_to_first_token`` / ``total_latency`` hold the timings in seconds,
+    measured from when the stream was created.
+
+    Streams are admitted by the latency-SLO router like any other request.
+    When the model lives in worker processes, or a draft model is loaded
+    (streamers cannot be combined with assisted decoding), the caption comes
+    from ``generate_captions`` in the background and is yielded whole.
+    """
+
+    def __init__(self, keywords, platform, tone, include_cta=True):
+        self.keywords = keywords
+        self.platform = platform
+        self.tone = tone
+        self.include_cta = include_cta
+        self.caption = None
+        self.time_to_first_token = None
+        self.total_latency = None
+        self._start = time.perf_counter()
+        self._error = None
+        self._generator = None
+        self._router = None
+        self._streamer = None
+        self._decoding = None
+        self._whole = None
+        if worker_pool() is None:
+            self._generator = load_model()
+        if self._generator is None or _model_cache.get('draft') is not None:
+            self._whole = STREAM_EXECUTOR.submit(generate_captions, keywords, platform, tone, 1, include_cta)
+            return
         
-        # Add call-to-action if requested
-        if include_cta and platform in CTA_TEMPLATES:
-            cta = random.choice(CTA_TEMPLATES[platform])
-            if len(caption + " " + cta) <= max_reasonable_length:
-                caption += " " + cta
+        router = slo_router()
+        if router is not None:
+            if not router.admit(1):
+                results = [None]
+                _shed(router, [self._request()], [0], results, 1)
+                self._finish(results[0][0])
+                return
+            self._router = router
+        try:
+            self._start_decoding()
+        except Exception as e:
+            _warn(f"AI generation failed: {str(e)}. Using fallback method.")
+            self._streamer = None
+            self._release(None)
+
+    def _request(self):
+        return self.keywords, self.platform, self.tone, self.include_cta
+
+    def _count(self, path):
+        if self._router is not None:
+            self._router.count(path)
+
+    def _release(self, elapsed):
+        if self._router is not None:
+            self._router.release(1, elapsed)
+
+    def _start_decoding(self):
+        from transformers import TextIteratorStreamer
+
+        generator = self._generator
+        prompt = build_prompt(self.keywords, self.tone)
+        # Streamers are not supported together with an assistant model
+        kwargs = _generate_kwargs(
+            generator, [prompt], tone=self.tone, char_budgets=[char_budget(self.platform)], assisted=False
+        )
+        self._streamer = TextIteratorStreamer(generator.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        kwargs['streamer'] = self._streamer
+        # Decode on the shared inference thread; tokens arrive through the streamer
+        self._decoding = INFERENCE.submit(self._decode, kwargs)
+
+    def _decode(self, kwargs):
+        import torch
+
+        started, elapsed = time.perf_counter(), None
+        try:
+            with metrics.timer('generate'), torch.no_grad():
+                self._generator.model.generate(**kwargs)
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            self._error = e
+            # Unblock the consumer, which would otherwise wait forever
+            self._streamer.end()
+        finally:
+            self._release(elapsed)
+
+    def _finish(self, caption):
+        self.caption = caption
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self._start
+        self.total_latency = time.perf_counter() - self._start
+
+    def __iter__(self):
+        if self.caption is not None:
+            yield self.caption
+            return
+        if self._whole is not None:
+            self._finish(self._whole.result()[0])
+            yield self.caption
+            return
+        if self._streamer is None:
+            metrics.count('fallback', reason='error')
+            self._count('fallback')
+            self._finish(generate_fallback_caption(self.keywords, self.platform, self.tone, self.include_cta))
+            yield self.caption
+            return
         
-        return caption
+        text = ''
+        for chunk in self._streamer:
+            if not chunk:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self._start
+            text += chunk
+            yield text.strip()
+        self._decoding.result()
         
-    except Exception as e:
-        st.warning(f"AI generation failed: {str(e)}. Using fallback method.")
-        return generate_fallback_caption(keywords, platform, tone, include_cta)
+        if self._error is not None:
+            _warn(f"AI generation failed: {str(self._error)}. Using fallback method.")
+            metrics.count('fallback', reason='error')
+            self._count('fallback')
+            self._finish(generate_fallback_caption(self.keywords, self.platform, self.tone, self.include_cta))
+        else:
+            self._count('model')
+            if metrics.enabled():
+                _record_generated(len(self._generator.tokenizer(text)['input_ids']))
+            self._finish(_finish_captions(self._generator, [text], self.platform, self.include_cta)[0])
+            if self._router is not None:
+                self._router.recent.put(_recent_key(self._request(), 1, None), (self.caption,))
+        yield self.caption
 
-def suggest_hashtags(keywords, platform):
+def stream_caption(keywords, platform, tone, include_cta=True):
     """
-    Suggest relevant hashtags based on keywords and platform.
+    Start generating a caption and return a CaptionStream of partial captions.
+
+    Decoding runs in a background thread, so callers can do other work (such
+    as suggesting hashtags and emojis) before iterating over the stream.
     """
-    # Define stop words
-    stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'])
-    
-    if NLTK_AVAILABLE:
+    return CaptionStream(keywords, platform, tone, include_cta)
+
+# Basic stop words, extended with NLTK's English list when available
+BASIC_STOP_WORDS = frozenset(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should'])
+
+@lru_cache(maxsize=None)
+def _stop_words():
+    """Load the stop-word set once per process"""
+    stop_words = set(BASIC_STOP_WORDS)
+    if nltk_resources()['stopwords']:
         try:
-            nltk_stop_words = set(stopwords.words('english'))
-            stop_words.update(nltk_stop_words)
-        except:
+            from nltk.corpus import stopwords
+            stop_words.update(stopwords.words('english'))
+        except Exception:
             pass  # Use our basic stop words
-    
-    # Extract hashtags from keywords - try NLTK first, then fallback
-    tokens = []
-    if NLTK_AVAILABLE:
-        try:
-            tokens = word_tokenize(keywords.lower())
-        except Exception as e:
-            # If NLTK tokenization fails (like punkt_tab error), use regex
-            tokens = re.findall(r'\b[a-zA-Z]+\b', keywords.lower())
-    
-    # If no tokens found, use simple split as final fallback
-    if not tokens:
-        tokens = [word.strip() for word in keywords.lower().split() if word.strip().isalpha()]
-    
-    hashtags = []
-    
-    for token in tokens:
-        if token.isalnum() and len(token) > 2 and token not in stop_words:
-            hashtags.append(f"#{token.capitalize()}")
-    
-    # Enhanced platform-specific hashtag suggestions
-    platform_hashtags = {
-        "Instagram": ["#InstaGood", "#PhotoOfTheDay", "#Love", "#Instagrams", "#Follow", "#Like4Like", "#Amazing", "#Beautiful"],
-        "Twitter": ["#Trending", "#Twitter", "#Social", "#News", "#Update", "#Thoughts", "#Community", "#Viral"],
-        "LinkedIn": ["#LinkedIn", "#Career", "#Business", "#Professional", "#Leadership", "#Growth", "#Success", "#Networking"],
-        "Facebook": ["#Facebook", "#Social", "#Community", "#Family", "#Friends", "#Life", "#Update", "#Share"]
-    }
+    return frozenset(stop_words)
+
+# Words split the way NLTK's word_tokenize splits them for our purposes:
+# hyphenated compounds stay whole, apostrophes and periods separate tokens
+WORD_PATTERN = re.compile(r"\w+(?:-\w+)*")
+
+# Enhanced platform-specific hashtag suggestions
+PLATFORM_HASHTAGS = {
+    "Instagram": ["#InstaGood", "#PhotoOfTheDay", "#Love", "#Instagrams", "#Follow", "#Like4Like", "#Amazing", "#Beautiful"],
+    "Twitter": ["#Trending", "#Twitter", "#Social", "#News", "#Update", "#Thoughts", "#Community", "#Viral"],
+    "LinkedIn": ["#LinkedIn", "#Career", "#Business", "#Professional", "#Leadership", "#Growth", "#Success", "#Networking"],
+    "Facebook": ["#Facebook", "#Social", "#Community", "#Family", "#Friends", "#Life", "#Update", "#Share"]
+}
+
+# Topic-specific hashtags, used when the topic appears anywhere in the keywords
+TOPIC_HASHTAGS = {
+    "travel": ["#Travel", "#Adventure", "#Wanderlust", "#Explore", "#Vacation"],
+    "food": ["#Food", "#Foodie", "#Delicious", "#Cooking", "#Recipe"],
+    "fitness": ["#Fitness", "#Gym", "#Workout", "#Health", "#Motivation"],
+    "tech": ["#Tech", "#Technology", "#Innovation", "#Digital", "#Future"],
+    "business": ["#Business", "#Entrepreneur", "#Success", "#Growth", "#Leadership"],
+    "motivation": ["#Motivation", "#Inspiration", "#Success", "#Goals", "#Mindset"]
+}
+
+# Enhanced keyword-to-emoji mapping, used when a keyword and a key overlap
+KEYWORD_EMOJI_MAP = {
+    "travel": ["✈️", "🌍", "🗺️", "🧳", "🏖️", "🏔️"],
+    "motivation": ["💪", "🌟", "🚀", "🔥", "⚡", "🏆"],
+    "tech": ["💻", "📱", "🔬", "🤖", "�", "⚙️"],
+    "food": ["🍔", "🍕", "🥗", "🍰", "☕", "🍜"],
+    "fitness": ["🏋️", "💪", "🏃", "🚴", "🥇", "⚽"],
+    "business": ["💼", "📈", "💰", "🤝", "📊", "🎯"],
+    "love": ["❤️", "💖", "😍", "💕", "🥰", "💝"],
+    "success": ["🏆", "🎉", "🌟", "🔥", "💯", "🚀"],
+    "happy": ["😊", "😁", "🎉", "🌈", "☀️", "🎈"],
+    "coffee": ["☕", "🌅", "💪", "⚡", "📅", "💼"]
+}
+
+@lru_cache(maxsize=None)
+def _topic_index():
+    from keyword_index import KeywordIndex
+    return KeywordIndex(TOPIC_HASHTAGS)
+
+@lru_cache(maxsize=None)
+def _emoji_index():
+    from keyword_index import KeywordIndex
+    return KeywordIndex(KEYWORD_EMOJI_MAP)
+
+# Optional keyword -> hashtag/emoji tables learned from past posts; built by
+# `python -m corpus_index` and matched on whole keywords
+CORPUS_INDEX_PATH = os.environ.get('CAPTION_CORPUS_INDEX', os.path.join(RESOURCE_DIR, 'corpus_index.json'))
+CORPUS_HASHTAGS = 3
+CORPUS_EMOJIS = 2
+
+@lru_cache(maxsize=None)
+def _corpus_tables():
+    """``(hashtags, emojis)`` keyword tables from the corpus index, empty without one"""
+    if not os.path.isfile(CORPUS_INDEX_PATH):
+        return {}, {}
+    try:
+        from corpus_index import load_index
+        return load_index(CORPUS_INDEX_PATH)
+    except Exception as e:
+        _warn(f"Could not load the corpus index: {e}. Using the built-in tables only.")
+        return {}, {}
+
+def _learned(table, text, k):
+    """Top ``k`` learned entries for every keyword of ``text``"""
+    if not table:
+        return []
+    return [value for token in WORD_PATTERN.findall(text) for value in table.get(token, ())[:k]]
+
+# Optional embedding index for hashtags/emojis related to, not just named in,
+# the keywords; built by prepare.py
+SEMANTIC_INDEX_DIR = os.environ.get('CAPTION_SEMANTIC_INDEX', os.path.join(RESOURCE_DIR, 'semantic_index'))
+SEMANTIC_HASHTAGS = 3
+SEMANTIC_EMOJIS = 2
+
+@lru_cache(maxsize=None)
+def _semantic_index():
+    if not os.path.isdir(SEMANTIC_INDEX_DIR):
+        return None
+    try:
+        from semantic_index import SemanticIndex
+        return SemanticIndex(SEMANTIC_INDEX_DIR)
+    except Exception as e:
+        _warn(f"Could not load the semantic index: {e}. Using keyword matching only.")
+        return None
+
+def _related(kind, items, k):
+    """Semantic matches for each (keywords, platform) item, all scored in one matrix product"""
+    index = _semantic_index()
+    if index is None:
+        return [() for _ in items]
+    stop_words = _stop_words()
+    queries = [
+        ' '.join(token for token in WORD_PATTERN.findall(keywords.lower()) if token not in stop_words)
+        for keywords, _ in items
+    ]
+    with metrics.timer('semantic'):
+        return [[label for label, _ in hits] for hits in index.search(kind, queries, k)]
+
+def _suggest_hashtags(keywords, platform, stop_words, topic_index, related=(), learned=None):
+    text = keywords.lower()
+    hashtags = [
+        f"#{token.capitalize()}" for token in WORD_PATTERN.findall(text)
+        if token.isalnum() and len(token) > 2 and token not in stop_words
+    ]
     
     # Add platform-specific hashtags
-    if platform in platform_hashtags:
+    if platform in PLATFORM_HASHTAGS:
         hashtags.extend(random.sample(
-            platform_hashtags[platform], 
-            min(5, len(platform_hashtags[platform]))
+            PLATFORM_HASHTAGS[platform], 
+            min(5, len(PLATFORM_HASHTAGS[platform]))
         ))
     
-    # Topic-specific hashtags
-    topic_hashtags = {
-        "travel": ["#Travel", "#Adventure", "#Wanderlust", "#Explore", "#Vacation"],
-        "food": ["#Food", "#Foodie", "#Delicious", "#Cooking", "#Recipe"],
-        "fitness": ["#Fitness", "#Gym", "#Workout", "#Health", "#Motivation"],
-        "tech": ["#Tech", "#Technology", "#Innovation", "#Digital", "#Future"],
-        "business": ["#Business", "#Entrepreneur", "#Success", "#Growth", "#Leadership"],
-        "motivation": ["#Motivation", "#Inspiration", "#Success", "#Goals", "#Mindset"]
-    }
-    
     # Add topic-specific hashtags
-    for topic, tags in topic_hashtags.items():
-        if topic in keywords.lower():
-            hashtags.extend(random.sample(tags, min(3, len(tags))))
+    for index in topic_index.keys_in(text):
+        tags = topic_index.values[index]
+        hashtags.extend(random.sample(tags, min(3, len(tags))))
     
-    # Remove duplicates and limit count
-    hashtags = list(dict.fromkeys(hashtags))[:15]  # Limit to 15 hashtags
+    # Add hashtags that past posts used with these keywords
+    hashtags.extend(_learned(learned, text, CORPUS_HASHTAGS))
     
-    return hashtags
-
-def suggest_emojis(keywords, platform):
-    """
-    Suggest relevant emojis based on keywords and platform.
-    """
-    # Enhanced keyword-to-emoji mapping
-    keyword_emoji_map = {
-        "travel": ["✈️", "🌍", "🗺️", "🧳", "🏖️", "🏔️"],
-        "motivation": ["💪", "🌟", "🚀", "🔥", "⚡", "🏆"],
-        "tech": ["💻", "📱", "🔬", "🤖", "�", "⚙️"],
-        "food": ["🍔", "🍕", "🥗", "🍰", "☕", "🍜"],
-        "fitness": ["🏋️", "💪", "🏃", "🚴", "🥇", "⚽"],
-        "business": ["💼", "📈", "💰", "🤝", "📊", "🎯"],
-        "love": ["❤️", "💖", "😍", "💕", "🥰", "💝"],
-        "success": ["🏆", "🎉", "🌟", "🔥", "💯", "🚀"],
-        "happy": ["😊", "😁", "🎉", "🌈", "☀️", "🎈"],
-        "coffee": ["☕", "🌅", "💪", "⚡", "📅", "💼"]
-    }
+    # Add hashtags that are semantically close to the keywords
+    hashtags.extend(related)
     
+    # Remove duplicates and limit count
+    return list(dict.fromkeys(hashtags))[:15]  # Limit to 15 hashtags
+
+def _suggest_emojis(keywords, platform, emoji_index, related=(), learned=None):
     selected_emojis = []
     
-    # Find emojis based on keywords
+    # Find emojis for every key that a keyword contains or is part of
     for keyword in keywords.lower().split():
-        for key, emojis in keyword_emoji_map.items():
-            if key in keyword or keyword in key:
-                selected_emojis.extend(random.sample(emojis, min(2, len(emojis))))
+        for index in emoji_index.related_keys(keyword):
+            emojis = emoji_index.values[index]
+            selected_emojis.extend(random.sample(emojis, min(2, len(emojis))))
+    
+    # Add emojis that past posts used with these keywords
+    selected_emojis.extend(_learned(learned, keywords.lower(), CORPUS_EMOJIS))
+    
+    # Add emojis that are semantically close to the keywords
+    selected_emojis.extend(related)
     
     # Add platform-specific emojis
     if platform in PLATFORM_EMOJIS:
@@ -294,6 +1049,47 @@ def suggest_emojis(keywords, platform):
         selected_emojis.extend(platform_emojis)
     
     # Remove duplicates and limit to 8 emojis
-    selected_emojis = list(dict.fromkeys(selected_emojis))[:8]
-    
-    return selected_emojis
\ No newline at end of file
+    return list(dict.fromkeys(selected_emojis))[:8]
+
+def suggest_hashtags(keywords, platform):
+    """
+    Suggest relevant hashtags based on keywords and platform.
+    """
+    stop_words = _stop_words()
+    with metrics.timer('hashtags'):
+        related = _related('hashtags', [(keywords, platform)], SEMANTIC_HASHTAGS)[0]
+        return _suggest_hashtags(keywords, platform, stop_words, _topic_index(), related, _corpus_tables()[0])
+
+def suggest_hashtags_batch(items):
+    """
+    Suggest hashtags for many (keywords, platform) pairs at once.
+    """
+    items = list(items)
+    stop_words, topic_index, learned = _stop_words(), _topic_index(), _corpus_tables()[0]
+    with metrics.timer('hashtags_batch'):
+        related = _related('hashtags', items, SEMANTIC_HASHTAGS)
+        return [
+            _suggest_hashtags(keywords, platform, stop_words, topic_index, tags, learned)
+            for (keywords, platform), tags in zip(items, related)
+        ]
+
+def suggest_emojis(keywords, platform):
+    """
+    Suggest relevant emojis based on keywords and platform.
+    """
+    with metrics.timer('emojis'):
+        related = _related('emojis', [(keywords, platform)], SEMANTIC_EMOJIS)[0]
+        return _suggest_emojis(keywords, platform, _emoji_index(), related, _corpus_tables()[1])
+
+def suggest_emojis_batch(items):
+    """
+    Suggest emojis for many (keywords, platform) pairs at once.
+    """
+    items = list(items)
+    emoji_index, learned = _emoji_index(), _corpus_tables()[1]
+    with metrics.timer('emojis_batch'):
+        related = _related('emojis', items, SEMANTIC_EMOJIS)
+        return [
+            _suggest_emojis(keywords, platform, emoji_index, emojis, learned)
+            for (keywords, platform), emojis in zip(items, related)
+        ]
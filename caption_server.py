@@ -0,0 +1,313 @@
+"""
+HTTP service for the caption engine with dynamic micro-batching.
+
+An asyncio front end accepts requests and puts them on a bounded queue. A
+scheduler drains the queue into micro-batches of up to ``max_batch_size``
+requests, waiting at most ``max_wait`` seconds for a batch to fill, and runs
+each batch as one batched GPT-2 call on a single inference thread. When the
+queue is full new requests are rejected with 429 so clients back off instead
+of piling up latency. With ``--slo-ms`` requests the model would answer too
+late are served from recent output or templates instead (see slo_router).
+
+Endpoints:
+    POST /caption  {"keywords": ..., "platform": ..., "tone": ..., "include_cta": ...}
+    GET  /health
+    GET  /stats
+    GET  /metrics  (Prometheus text format; enable with --metrics or CAPTION_METRICS=1)
+
+Usage:
+    python caption_server.py --port 8080 --max-batch-size 8 --max-wait-ms 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import metrics
+from batch_captions import normalize_row
+from caption_generator import (
+    generate_captions_batch,
+    load_model,
+    router_stats,
+    suggest_emojis,
+    suggest_hashtags,
+    worker_pool,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class QueueFullError(Exception):
+    """Raised when the request queue is at capacity"""
+
+
+def _suggestions(keywords, platform):
+    return suggest_hashtags(keywords, platform), suggest_emojis(keywords, platform)
+
+
+class MicroBatcher:
+    """Collect queued requests into batches and run them on one inference thread"""
+
+    def __init__(self, max_batch_size=8, max_wait=0.01, max_queue=64, run_batch=generate_captions_batch):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.run_batch = run_batch
+        self._queue = None
+        self._task = None
+        # One thread: the torch pipeline must never be entered concurrently
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='caption-inference')
+        self._stats = {'requests': 0, 'rejected': 0, 'batches': 0, 'batched_requests': 0, 'errors': 0}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.ensure_future(self._schedule())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, request):
+        """Queue one (keywords, platform, tone, include_cta) request and wait for its caption"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._stats['rejected'] += 1
+            raise QueueFullError()
+        self._stats['requests'] += 1
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting without yielding to the loop
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _schedule(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            requests = [request for request, _, _ in batch]
+            self._stats['batches'] += 1
+            self._stats['batched_requests'] += len(batch)
+            if metrics.enabled():
+                now = time.perf_counter()
+                for _, _, enqueued in batch:
+                    metrics.observe('queue_wait', now - enqueued)
+                metrics.count('batch_requests', len(batch))
+            try:
+                with metrics.timer('batch'):
+                    results = await loop.run_in_executor(self._executor, self.run_batch, requests)
+            except Exception as e:
+                self._stats['errors'] += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), captions in zip(batch, results):
+                if not future.done():
+                    future.set_result(captions[0])
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        stats['mean_batch_size'] = stats['batched_requests'] / stats['batches'] if stats['batches'] else 0.0
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_wait_ms'] = self.max_wait * 1000
+        return stats
+
+
+class CaptionServer:
+    """Minimal HTTP/1.1 server (keep-alive, JSON bodies) in front of a MicroBatcher"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'error': 'invalid Content-Length'}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload, extra_headers = await self._route(method, path.split('?', 1)[0], body)
+                await self._respond(writer, status, payload, keep_alive, extra_headers)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, body):
+        if path == '/caption' and method == 'POST':
+            return await self._caption(body)
+        if path == '/health' and method == 'GET':
+            return 200, self._health(), None
+        if path == '/stats' and method == 'GET':
+            return 200, dict(self.batcher.stats(), routes=router_stats()), None
+        if path == '/metrics' and method == 'GET':
+            return 200, metrics.prometheus_text(), None
+        if path in ('/caption', '/health', '/stats', '/metrics'):
+            return 405, {'error': 'method not allowed'}, None
+        return 404, {'error': 'not found'}, None
+
+    def _health(self):
+        # With a worker pool the model lives in the workers, never in this process
+        pool = worker_pool()
+        if pool is not None:
+            ready = pool.ready()
+            return {'status': 'ok', 'model_loaded': ready, 'pool_ready': ready, 'workers': pool.workers}
+        return {'status': 'ok', 'model_loaded': load_model() is not None}
+
+    async def _caption(self, body):
+        try:
+            row = json.loads(body or b'{}')
+            if not isinstance(row, dict):
+                raise ValueError("expected a JSON object")
+            request = normalize_row(row)
+        except ValueError as e:
+            return 400, {'error': str(e)}, None
+
+        keywords, platform, _, _ = request
+        start = time.perf_counter()
+        try:
+            caption = await self.batcher.submit(request)
+        except QueueFullError:
+            return 429, {'error': 'server busy, retry later'}, {'Retry-After': '1'}
+        except Exception as e:
+            logger.exception("Caption generation failed")
+            return 500, {'error': str(e)}, None
+
+        # Suggestions can embed the keywords (semantic index); keep them off the event loop
+        hashtags, emojis = await asyncio.get_running_loop().run_in_executor(None, _suggestions, keywords, platform)
+        return 200, {
+            'caption': caption,
+            'hashtags': hashtags,
+            'emojis': emojis,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+        }, None
+
+    async def _respond(self, writer, status, payload, keep_alive=True, extra_headers=None):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = "application/json; charset=utf-8"
+        headers = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        headers.extend(f"{name}: {value}" for name, value in (extra_headers or {}).items())
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+async def _serve(args):
+    # Load the model (or start the workers that load it) before accepting
+    # traffic so the first batch is not slow
+    if worker_pool() is None:
+        load_model()
+    batcher = MicroBatcher(args.max_batch_size, args.max_wait_ms / 1000, args.max_queue)
+    server = CaptionServer(batcher)
+    host, port = await server.start(args.host, args.port)
+    logger.info("Serving captions on http://%s:%s", host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve captions, hashtags and emojis over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Requests per batched model call")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0, help="Longest a request waits for its batch to fill")
+    parser.add_argument("--max-queue", type=int, default=64, help="Queued requests before answering 429")
+    parser.add_argument("--metrics", action="store_true", help="Collect per-stage timings for GET /metrics")
+    parser.add_argument("--slo-ms", type=float, help="Latency SLO; answer from templates when the model would miss it")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+    if args.slo_ms:
+        os.environ['CAPTION_SLO_MS'] = str(args.slo_ms)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
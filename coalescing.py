@@ -0,0 +1,111 @@
+"""
+Request coalescing and a single inference executor.
+
+``SingleFlight`` lets concurrent callers with the same key share one
+in-progress computation: the first caller (the leader) runs it, later callers
+wait for the leader's result instead of starting their own. Once the result
+is delivered the key is forgotten, so nothing is cached beyond the flight.
+
+``InferenceExecutor`` funnels every model call through one thread, so the
+shared torch pipeline is never entered from two threads at once no matter
+how many Streamlit sessions are running.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import metrics
+
+
+class SingleFlight:
+    """Share one in-progress call among concurrent callers with the same key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'requests': 0, 'executed': 0, 'coalesced': 0, 'wait_s': 0.0, 'max_wait_s': 0.0}
+
+    def run(self, key, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, or the result of an identical call already running"""
+        start = time.perf_counter()
+        with self._lock:
+            self._stats['requests'] += 1
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self._stats['executed'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if leader:
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._flights[key]
+        try:
+            return future.result()
+        finally:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._stats['wait_s'] += waited
+                self._stats['max_wait_s'] = max(self._stats['max_wait_s'], waited)
+
+    def stats(self):
+        """
+        Counters plus ``dedup_ratio`` (share of requests answered by another
+        caller's flight) and mean/max time callers spent waiting, in ms.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._flights)
+        requests, waited = stats['requests'], stats.pop('wait_s')
+        stats['dedup_ratio'] = stats['coalesced'] / requests if requests else 0.0
+        stats['mean_wait_ms'] = waited / requests * 1000 if requests else 0.0
+        stats['max_wait_ms'] = stats.pop('max_wait_s') * 1000
+        return stats
+
+
+class InferenceExecutor:
+    """Run model calls one at a time on a dedicated thread"""
+
+    def __init__(self, name='caption-inference'):
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name, initializer=self._mark)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'queue_s': 0.0, 'max_queue_s': 0.0}
+
+    def _mark(self):
+        self._local.inside = True
+
+    def _timed(self, submitted, fn, args, kwargs):
+        queued = time.perf_counter() - submitted
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['queue_s'] += queued
+            self._stats['max_queue_s'] = max(self._stats['max_queue_s'], queued)
+        metrics.observe('inference_queue', queued)
+        return fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn`` on the inference thread; returns a Future"""
+        return self._executor.submit(self._timed, time.perf_counter(), fn, args, kwargs)
+
+    def run(self, fn, *args, **kwargs):
+        """Run ``fn`` on the inference thread and wait for its result"""
+        if getattr(self._local, 'inside', False):
+            # Already on the inference thread; queueing would deadlock
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        """Calls run plus mean/max time they queued behind other model calls, in ms"""
+        with self._lock:
+            stats = dict(self._stats)
+        calls, queued = stats['calls'], stats.pop('queue_s')
+        stats['mean_queue_ms'] = queued / calls * 1000 if calls else 0.0
+        stats['max_queue_ms'] = stats.pop('max_queue_s') * 1000
+        return stats
@@ -0,0 +1,306 @@
+"""
+Learn keyword -> hashtag/emoji tables from a corpus of past posts.
+
+The hand-written ``TOPIC_HASHTAGS`` and ``KEYWORD_EMOJI_MAP`` tables only know
+a dozen topics. This indexer streams a file of historical posts (JSON lines
+with a text field, or plain text with one post per line), pulls the keywords,
+hashtags and emojis out of every post and counts which hashtags and emojis
+appear alongside which keywords.
+
+The file is memory-mapped and cut into chunks at newline boundaries; worker
+processes each map the file themselves and count one chunk at a time, so
+only offsets cross the process boundary and memory stays bounded by the
+chunk size no matter how large the corpus is. The parent merges the
+per-chunk counters as they arrive; whenever a co-occurrence table (in a
+worker or in the parent) grows past ``max_pairs`` its rarest pairs are
+dropped, and the keyword, tag and spelling counters are cut back to their
+``max_terms`` most common entries. Hashtags are counted lower-cased, so
+#Coffee and #coffee are one tag.
+
+The result is a small JSON file of the top hashtags and emojis per keyword,
+ranked by co-occurrence weighted by how specific each hashtag or emoji is
+(so ubiquitous ones like #love do not top every keyword). caption_generator
+loads it at start-up from ``CAPTION_CORPUS_INDEX`` (default
+``<resource dir>/corpus_index.json``).
+
+Usage:
+    python -m corpus_index posts.jsonl [--field text] [--processes 8]
+"""
+import argparse
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import resource
+import time
+from collections import Counter
+
+from utils import extract_keywords_from_caption
+
+INDEX_VERSION = 1
+
+# Bytes per worker task; also bounds what one worker holds in memory
+CHUNK_SIZE = 32 * 1024 * 1024
+
+# Co-occurring terms kept per post, so one huge post cannot flood the counters
+MAX_KEYWORDS_PER_POST = 20
+MAX_TAGS_PER_POST = 30
+
+# Posts between checks of a worker's counters against ``max_pairs``/``max_terms``
+PRUNE_EVERY = 10000
+
+HASHTAG_PATTERN = re.compile(r'#\w+')
+
+# Pictographs with optional variation selectors and ZWJ sequences (👨‍👩‍👧)
+_PICTOGRAPH = '[\u2600-\u27bf\U0001f300-\U0001f64f\U0001f680-\U0001f6ff\U0001f900-\U0001faff]\ufe0f?'
+EMOJI_PATTERN = re.compile(f'{_PICTOGRAPH}(?:\u200d{_PICTOGRAPH})*')
+
+
+def post_terms(text, stop_words):
+    """
+    ``(keywords, hashtags, emojis)`` of one post, each in first-seen order.
+    Hashtags keep their spelling but repeat only once whatever their case.
+    """
+    keywords = extract_keywords_from_caption(text, MAX_KEYWORDS_PER_POST, stop_words)
+    hashtags = {}
+    for tag in HASHTAG_PATTERN.findall(text):
+        hashtags.setdefault(tag.lower(), tag)
+    hashtags = list(hashtags.values())[:MAX_TAGS_PER_POST]
+    emojis = list(dict.fromkeys(EMOJI_PATTERN.findall(text)))[:MAX_TAGS_PER_POST]
+    return keywords, hashtags, emojis
+
+
+class CorpusCounts:
+    """Keyword, hashtag and emoji frequencies plus their co-occurrences"""
+
+    def __init__(self):
+        self.posts = 0
+        self.skipped = 0
+        self.keywords = Counter()
+        self.tags = Counter()  # Lower-cased hashtags and emojis
+        self.spellings = Counter()  # Hashtags as written
+        self.pairs = Counter()  # (keyword, hashtag or emoji) -> posts with both
+
+    def add(self, keywords, hashtags, emojis):
+        self.posts += 1
+        self.keywords.update(keywords)
+        self.spellings.update(hashtags)
+        tags = [tag.lower() for tag in hashtags] + emojis
+        self.tags.update(tags)
+        self.pairs.update((keyword, tag) for keyword in keywords for tag in tags)
+
+    def merge(self, other, max_pairs=None, max_terms=None):
+        self.posts += other.posts
+        self.skipped += other.skipped
+        self.keywords.update(other.keywords)
+        self.tags.update(other.tags)
+        self.spellings.update(other.spellings)
+        self.pairs.update(other.pairs)
+        if max_pairs and len(self.pairs) > max_pairs:
+            self.prune(max_pairs)
+        if max_terms:
+            self.cap_terms(max_terms)
+
+    def prune(self, max_pairs):
+        """Drop the rarest pairs until at most ``max_pairs`` remain"""
+        floor = 1
+        while len(self.pairs) > max_pairs:
+            self.pairs = Counter({pair: count for pair, count in self.pairs.items() if count > floor})
+            floor += 1
+
+    def cap_terms(self, max_terms):
+        """Keep only the ``max_terms`` most common keywords, tags and spellings"""
+        for name in ('keywords', 'tags', 'spellings'):
+            counter = getattr(self, name)
+            if len(counter) > max_terms:
+                setattr(self, name, Counter(dict(counter.most_common(max_terms))))
+
+
+def _read_post(line, field):
+    """Post text from one line, or None if the line holds no post"""
+    line = line.strip()
+    if not line:
+        return None
+    if field is None:
+        return line.decode('utf-8', errors='replace')
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    text = record.get(field) if isinstance(record, dict) else None
+    return text if isinstance(text, str) else None
+
+
+_worker_args = {}
+
+
+def _init_worker(path, field, stop_words, max_pairs, max_terms):
+    _worker_args.update(path=path, field=field, stop_words=stop_words, max_pairs=max_pairs, max_terms=max_terms)
+
+
+def _count_chunk(span):
+    """Worker task: count the posts in bytes ``[start, end)`` of the corpus"""
+    start, end = span
+    field, stop_words, max_pairs, max_terms = (
+        _worker_args[name] for name in ('field', 'stop_words', 'max_pairs', 'max_terms')
+    )
+    counts = CorpusCounts()
+    with open(_worker_args['path'], 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # One line at a time straight from the map; slicing the whole span
+        # would copy it and split() would hold every line at once
+        position = start
+        while position < end:
+            newline = data.find(b'\n', position, end)
+            stop = end if newline == -1 else newline
+            line = data[position:stop]
+            position = stop + 1
+            text = _read_post(line, field)
+            if text is None:
+                if line.strip():
+                    counts.skipped += 1
+                continue
+            counts.add(*post_terms(text, stop_words))
+            if counts.posts % PRUNE_EVERY == 0:
+                if len(counts.pairs) > max_pairs:
+                    counts.prune(max_pairs)
+                counts.cap_terms(max_terms)
+    return counts
+
+
+def chunk_spans(path, chunk_size=CHUNK_SIZE):
+    """Byte ranges of about ``chunk_size`` that start and end on line boundaries"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    spans = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = data.find(b'\n', min(start + chunk_size, size) - 1)
+            end = size if end == -1 else end + 1
+            spans.append((start, end))
+            start = end
+    return spans
+
+
+def count_corpus(path, field='text', processes=None, chunk_size=CHUNK_SIZE, max_pairs=2_000_000,
+                 stop_words=None, max_terms=500_000):
+    """
+    Count a corpus in parallel and return ``(counts, processes)``: the merged
+    ``CorpusCounts`` and the number of worker processes actually used, which
+    is never more than the number of chunks.
+
+    ``field`` names the text field of JSON-lines posts; ``None`` reads the
+    file as plain text, one post per line.
+    """
+    if stop_words is None:
+        from caption_generator import _stop_words
+        stop_words = _stop_words()
+    spans = chunk_spans(path, chunk_size)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(spans) or 1))
+    total = CorpusCounts()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes, _init_worker, (path, field, frozenset(stop_words), max_pairs, max_terms)) as pool:
+        for counts in pool.imap_unordered(_count_chunk, spans):
+            total.merge(counts, max_pairs, max_terms)
+    return total, processes
+
+
+def _top(scored, k):
+    return [tag for tag, _ in sorted(scored.items(), key=lambda item: (-item[1], item[0]))[:k]]
+
+
+def build_tables(counts, min_count=5, top_k=5):
+    """
+    ``{'hashtags': {keyword: [...]}, 'emojis': {keyword: [...]}}`` from ``counts``.
+
+    Only pairs seen in at least ``min_count`` posts are used. Hashtags are
+    written in their most common spelling.
+    """
+    spelling = {}
+    for tag, count in counts.spellings.items():
+        best = spelling.get(tag.lower())
+        if best is None or (count, best) > (counts.spellings[best], tag):
+            spelling[tag.lower()] = tag
+
+    hashtags, emojis = {}, {}
+    for (keyword, tag), count in counts.pairs.items():
+        # A tag cut by ``max_terms`` has no frequency left to weight it by
+        if count < min_count or tag not in counts.tags:
+            continue
+        # Inverse document frequency: rare tags say more about the keyword
+        weight = count * math.log((counts.posts + 1) / counts.tags[tag])
+        if tag.startswith('#'):
+            scores = hashtags.setdefault(keyword, Counter())
+            scores[spelling.get(tag, tag)] += weight
+        else:
+            emojis.setdefault(keyword, Counter())[tag] += weight
+    return {
+        'hashtags': {keyword: _top(scores, top_k) for keyword, scores in sorted(hashtags.items())},
+        'emojis': {keyword: _top(scores, top_k) for keyword, scores in sorted(emojis.items())},
+    }
+
+
+def write_index(path, counts, min_count=5, top_k=5):
+    tables = build_tables(counts, min_count, top_k)
+    index = dict(version=INDEX_VERSION, posts=counts.posts, **tables)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+    return index
+
+
+def load_index(path):
+    """``(hashtags, emojis)`` keyword tables from an index file"""
+    with open(path, encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('version') != INDEX_VERSION:
+        raise ValueError(f"unsupported corpus index version {index.get('version')}")
+    return index['hashtags'], index['emojis']
+
+
+def _peak_rss_mb():
+    usage = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return max(usage) / 1024  # ru_maxrss is in KiB on Linux
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Learn hashtag/emoji tables from past posts.")
+    parser.add_argument("corpus", help="JSON lines file of posts, or plain text with one post per line")
+    parser.add_argument("--field", default="text", help="Text field of each JSON post")
+    parser.add_argument("--plain", action="store_true", help="Read the corpus as plain text")
+    parser.add_argument("--output", help="Index file (default: CAPTION_CORPUS_INDEX or <resource dir>/corpus_index.json)")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_SIZE // (1024 * 1024), help="Chunk size per task")
+    parser.add_argument("--min-count", type=int, default=5, help="Posts a keyword/tag pair needs to be kept")
+    parser.add_argument("--top", type=int, default=5, help="Hashtags and emojis kept per keyword")
+    parser.add_argument("--max-pairs", type=int, default=2_000_000, help="Co-occurrence pairs held while merging")
+    parser.add_argument("--max-terms", type=int, default=500_000,
+                        help="Keywords, tags and hashtag spellings held while merging")
+    args = parser.parse_args(argv)
+
+    from caption_generator import CORPUS_INDEX_PATH
+
+    started = time.perf_counter()
+    counts, processes = count_corpus(
+        args.corpus, None if args.plain else args.field, args.processes,
+        args.chunk_mb * 1024 * 1024, args.max_pairs, max_terms=args.max_terms
+    )
+    elapsed = time.perf_counter() - started
+    output = args.output or CORPUS_INDEX_PATH
+    index = write_index(output, counts, args.min_count, args.top)
+
+    rate = counts.posts / elapsed if elapsed else 0.0
+    print(f"{counts.posts} posts ({counts.skipped} skipped) in {elapsed:.1f}s: "
+          f"{rate:.0f} posts/s, {rate / processes:.0f} posts/s/core on {processes} processes, "
+          f"peak RSS {_peak_rss_mb():.0f} MB")
+    print(f"corpus index: {len(index['hashtags'])} keywords with hashtags, "
+          f"{len(index['emojis'])} with emojis written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Two-tier cache for generated captions.
+
+A bounded in-process LRU sits in front of a persistent SQLite store with TTL
+and size-based eviction. Only seeded generations are cached, so a hit returns
+exactly what the model would have produced for that seed rather than some
+earlier random sample.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MEMORY_ENTRIES = 512
+DEFAULT_DISK_ENTRIES = 100000
+DEFAULT_TTL = 7 * 24 * 3600  # One week
+
+
+def make_key(*parts):
+    """Build a stable cache key from JSON-serialisable parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used mapping"""
+
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Persistent JSON value store with a TTL and a maximum entry count"""
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_DISK_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, created FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                return None
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return json.loads(value)
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl:
+            self._conn.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,))
+        (count,) = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()
+        if count > self.max_entries:
+            # Drop the least recently used entries beyond the limit
+            self._conn.execute(
+                'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+
+class GenerationCache:
+    """Memory LRU in front of an optional SQLite tier, with hit/miss counters"""
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self._stats_lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._count('disk_hits')
+                self.memory.put(key, value)
+                return value
+        self._count('misses')
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size of each tier"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['memory_entries'] = len(self.memory)
+        stats['disk_entries'] = len(self.disk) if self.disk is not None else 0
+        return stats
+
+
+def cache_from_env(default_path):
+    """
+    Build the cache described by the environment.
+
+    ``CAPTION_CACHE_SIZE`` bounds the memory tier, ``CAPTION_CACHE_PATH`` sets
+    the SQLite file (empty disables the disk tier), ``CAPTION_CACHE_TTL`` is
+    the disk TTL in seconds and ``CAPTION_CACHE_MAX_ENTRIES`` its size limit.
+    """
+    memory = LRUCache(int(os.environ.get('CAPTION_CACHE_SIZE', DEFAULT_MEMORY_ENTRIES)))
+    path = os.environ.get('CAPTION_CACHE_PATH', default_path)
+    disk = None
+    if path:
+        disk = SQLiteCache(
+            path,
+            ttl=float(os.environ.get('CAPTION_CACHE_TTL', DEFAULT_TTL)),
+            max_entries=int(os.environ.get('CAPTION_CACHE_MAX_ENTRIES', DEFAULT_DISK_ENTRIES)),
+        )
+    return GenerationCache(memory, disk)
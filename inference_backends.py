@@ -0,0 +1,83 @@
+"""
+CPU inference backends for the caption model.
+
+``fp32`` keeps the weights as loaded, ``bf16`` casts them to bfloat16 and
+``int8`` applies PyTorch dynamic quantization to the linear layers of the
+transformer blocks (weights stored as int8, activations quantized on the
+fly). GPT-2 implements its projections with transformers' ``Conv1D``, which
+dynamic quantization does not recognise, so those are first rewritten as
+equivalent ``nn.Linear`` layers. The output head stays in full precision to
+keep sampling close to fp32.
+
+Selected with ``CAPTION_BACKEND``; torch thread pools are sized with
+``CAPTION_INTRA_OP_THREADS`` and ``CAPTION_INTER_OP_THREADS``.
+"""
+import os
+
+import torch
+
+BACKENDS = ('fp32', 'bf16', 'int8')
+DEFAULT_BACKEND = 'fp32'
+
+
+def backend_from_env():
+    """Return the configured backend name, validated"""
+    backend = os.environ.get('CAPTION_BACKEND', DEFAULT_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CAPTION_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def configure_threads(intra_op=None, inter_op=None):
+    """
+    Size torch's intra-op and inter-op thread pools.
+
+    Values default to ``CAPTION_INTRA_OP_THREADS`` / ``CAPTION_INTER_OP_THREADS``
+    and are left alone when unset. The inter-op pool can only be sized before
+    torch runs any parallel work, so call this before loading the model.
+    """
+    intra_op = intra_op or os.environ.get('CAPTION_INTRA_OP_THREADS')
+    inter_op = inter_op or os.environ.get('CAPTION_INTER_OP_THREADS')
+    if intra_op:
+        torch.set_num_threads(int(intra_op))
+    if inter_op:
+        try:
+            torch.set_num_interop_threads(int(inter_op))
+        except RuntimeError:
+            # Already initialised in this process; keep the existing pool
+            pass
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+
+def _conv1d_to_linear(module):
+    """Replace transformers Conv1D layers with equivalent nn.Linear layers in place"""
+    for name, child in module.named_children():
+        if type(child).__name__ == 'Conv1D':
+            # Conv1D computes x @ W + b with W of shape (in, out)
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features, dtype=child.weight.dtype)
+            with torch.no_grad():
+                linear.weight.copy_(child.weight.t())
+                linear.bias.copy_(child.bias)
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def apply_backend(model, backend):
+    """Return ``model`` converted for the given backend, in eval mode"""
+    model.eval()
+    if backend == 'fp32':
+        return model.float()
+    if backend == 'bf16':
+        return model.to(torch.bfloat16)
+    if backend == 'int8':
+        model = model.float()
+        _conv1d_to_linear(model)
+        output_head = model.get_output_embeddings()
+        targets = {
+            name for name, module in model.named_modules()
+            if isinstance(module, torch.nn.Linear) and module is not output_head
+        }
+        return torch.ao.quantization.quantize_dynamic(model, targets, dtype=torch.qint8, inplace=True)
+    raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,137 @@
+"""
+Precompiled keyword index for the hashtag and emoji suggesters.
+
+The suggestion tables map topic keys ("travel", "coffee", ...) to hashtags or
+emojis. Matching used to scan every key for every request; here the keys are
+compiled once into an Aho-Corasick automaton, so finding every key that
+occurs inside a piece of text costs one pass over the text regardless of how
+many keys the table holds. The reverse question (which keys contain a short
+word) is answered from a trigram index: only keys sharing the word's rarest
+trigram are checked.
+
+Tables with fewer than ``SCAN_BELOW`` keys (such as the built-in ones) skip
+both structures and scan their keys, which is faster at that size.
+"""
+from collections import defaultdict
+
+GRAM = 3
+
+# Below this many keys a plain scan beats the automaton; benchmarks/
+# bench_suggestions measured the crossover at about 80 keys
+SCAN_BELOW = 64
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher over a fixed list of patterns"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # Trie as a list of {char: state} dicts; state 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = nxt
+            self._output[state] = self._output[state] + (index,)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                # Inherit matches that end at the failure state
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find(self, text):
+        """Return the set of pattern indices that occur in ``text``"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class KeywordIndex:
+    """
+    Compiled view of a ``{key: values}`` table.
+
+    Matches are returned as key indices in table order, so results line up
+    with iterating over the original dict.
+    """
+
+    def __init__(self, table):
+        self.keys = list(table)
+        self.values = [table[key] for key in self.keys]
+        self._scan = len(self.keys) < SCAN_BELOW
+        if self._scan:
+            return
+        self._automaton = AhoCorasick(self.keys)
+        # Key indices by every substring shorter than GRAM and by every GRAM-gram
+        self._short = defaultdict(list)
+        self._grams = defaultdict(list)
+        for index, key in enumerate(self.keys):
+            shorts = {key[i:i + n] for n in range(1, GRAM) for i in range(len(key) - n + 1)}
+            for short in shorts:
+                self._short[short].append(index)
+            for gram in {key[i:i + GRAM] for i in range(len(key) - GRAM + 1)}:
+                self._grams[gram].append(index)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def keys_in(self, text):
+        """Indices of keys that occur as substrings of ``text``"""
+        if self._scan:
+            return [index for index, key in enumerate(self.keys) if key and key in text]
+        return sorted(self._automaton.find(text))
+
+    def keys_containing(self, word):
+        """Indices of keys that contain ``word`` as a substring"""
+        if not word:
+            return []
+        if self._scan:
+            return [index for index, key in enumerate(self.keys) if word in key]
+        if len(word) < GRAM:
+            return list(self._short.get(word, ()))
+        # Every key containing the word contains all of its grams; check only
+        # the keys listed under the rarest one
+        candidates = min(
+            (self._grams.get(word[i:i + GRAM], ()) for i in range(len(word) - GRAM + 1)),
+            key=len,
+        )
+        keys = self.keys
+        return [index for index in candidates if word in keys[index]]
+
+    def related_keys(self, word):
+        """Indices of keys that occur in ``word`` or contain it"""
+        if self._scan:
+            return [
+                index for index, key in enumerate(self.keys)
+                if (key and key in word) or (word and word in key)
+            ]
+        return sorted(set(self._automaton.find(word)).union(self.keys_containing(word)))
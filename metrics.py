@@ -0,0 +1,222 @@
+"""
+Lightweight instrumentation for the caption pipeline.
+
+Stages are timed with ``timer(stage)`` and events counted with
+``count(name, value, **labels)``. Everything is off unless enabled (via
+``enable()`` or ``CAPTION_METRICS=1``); while disabled ``timer`` returns a
+shared no-op context manager and ``count`` returns after one flag check, so
+instrumented code pays next to nothing.
+
+Recorded values can be read with ``snapshot()``, exported in the Prometheus
+text format with ``prometheus_text()``, or forwarded to callbacks registered
+with ``add_hook``. ``process_memory()`` reads this process's unique and
+shared memory.
+"""
+import os
+import threading
+import time
+
+# Histogram buckets for stage durations, in seconds
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.environ.get('CAPTION_METRICS', '').lower() in ('1', 'true', 'yes')
+_lock = threading.Lock()
+_hooks = []
+_timers = {}
+_counters = {}
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    """Turn metric collection on or off for this process"""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def add_hook(callback):
+    """
+    Register ``callback(kind, name, value, labels)`` to receive every metric.
+
+    ``kind`` is ``'timer'`` (value in seconds) or ``'counter'``; ``labels`` is
+    a dict. Hooks run synchronously on the recording thread, so keep them cheap.
+    """
+    with _lock:
+        _hooks.append(callback)
+    return callback
+
+
+def remove_hook(callback):
+    with _lock:
+        if callback in _hooks:
+            _hooks.remove(callback)
+
+
+def reset():
+    """Forget every recorded value (hooks stay registered)"""
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _emit(kind, name, value, labels):
+    for hook in list(_hooks):
+        try:
+            hook(kind, name, value, labels)
+        except Exception:
+            pass  # A broken hook must never break caption generation
+
+
+def observe(stage, seconds):
+    """Record one duration for ``stage``"""
+    if not _enabled:
+        return
+    with _lock:
+        entry = _timers.get(stage)
+        if entry is None:
+            entry = _timers[stage] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)}
+        entry['count'] += 1
+        entry['sum'] += seconds
+        entry['max'] = max(entry['max'], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry['buckets'][i] += 1
+                break
+    if _hooks:
+        _emit('timer', stage, seconds, {'stage': stage})
+
+
+def count(name, value=1, **labels):
+    """Add ``value`` to the counter ``name`` with the given labels"""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    if _hooks:
+        _emit('counter', name, value, labels)
+
+
+class _Timer:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(stage):
+    """Context manager timing one run of ``stage`` (a no-op while disabled)"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def snapshot():
+    """
+    Return recorded values as ``{'stages': {...}, 'counters': {...}}``.
+
+    Stage entries hold count, total, mean and max seconds; counter keys are
+    ``name`` or ``name{label=value,...}``.
+    """
+    with _lock:
+        stages = {
+            stage: {
+                'count': entry['count'],
+                'total_s': entry['sum'],
+                'mean_ms': entry['sum'] / entry['count'] * 1000 if entry['count'] else 0.0,
+                'max_ms': entry['max'] * 1000,
+            }
+            for stage, entry in _timers.items()
+        }
+        counters = {_format_key(name, labels): value for (name, labels), value in _counters.items()}
+    return {'stages': stages, 'counters': counters}
+
+
+def _format_key(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={value}' for key, value in labels) + '}'
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def prometheus_text(prefix='caption'):
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        if _timers:
+            metric = f'{prefix}_stage_seconds'
+            lines.append(f'# HELP {metric} Time spent in each pipeline stage.')
+            lines.append(f'# TYPE {metric} histogram')
+            for stage, entry in sorted(_timers.items()):
+                cumulative = 0
+                for bound, hits in zip(BUCKETS, entry['buckets']):
+                    cumulative += hits
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {entry["sum"]}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {entry["count"]}')
+
+        names = sorted(set(name for name, _ in _counters))
+        for name in names:
+            metric = f'{prefix}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (counter, labels), value in sorted(_counters.items()):
+                if counter == name:
+                    lines.append(f'{metric}{_prometheus_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def process_memory():
+    """
+    Memory of this process in MiB from ``/proc/self/smaps_rollup``: ``rss``,
+    ``pss`` (shared pages split between the processes mapping them),
+    ``unique`` (private pages) and ``shared`` (pages other processes map
+    too). Empty where the file does not exist.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {
+                parts[0].rstrip(':'): int(parts[1])
+                for parts in (line.split() for line in f)
+                if len(parts) == 3 and parts[2] == 'kB'
+            }
+    except OSError:
+        return {}
+    return {
+        'rss': fields.get('Rss', 0) / 1024,
+        'pss': fields.get('Pss', 0) / 1024,
+        'unique': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024,
+        'shared': (fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024,
+    }
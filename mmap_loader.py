@@ -0,0 +1,115 @@
+"""
+Load a local safetensors model by memory-mapping its weights.
+
+``from_pretrained`` reads every weight into freshly allocated, private
+memory, so each process that loads GPT-2 pays the full read and holds its own
+copy. Here the safetensors files are mapped copy-on-write instead: the
+header is parsed by hand, every tensor is a view into the mapping, and the
+model is built without initialising its weights before the views are
+assigned as its parameters. Loading then costs little more than building the
+module tree, pages are read on first touch, and processes on one host that
+map the same file share those pages through the page cache.
+
+Sharing only holds while nothing writes to the weights: the ``fp32`` backend
+keeps them as they are on disk (if they are stored as fp32), while ``bf16``
+and ``int8`` convert them into private memory.
+"""
+import json
+import os
+import struct
+
+import torch
+
+WEIGHTS_FILE = 'model.safetensors'
+WEIGHTS_INDEX_FILE = 'model.safetensors.index.json'
+
+DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool,
+}
+
+
+def weight_files(directory):
+    """The safetensors files of a saved model, or an empty list if it has none"""
+    index_path = os.path.join(directory, WEIGHTS_INDEX_FILE)
+    if os.path.isfile(index_path):
+        with open(index_path, encoding='utf-8') as f:
+            shards = sorted(set(json.load(f)['weight_map'].values()))
+        return [os.path.join(directory, shard) for shard in shards]
+    path = os.path.join(directory, WEIGHTS_FILE)
+    return [path] if os.path.isfile(path) else []
+
+
+def read_header(path):
+    """``(header, data offset)`` of a safetensors file"""
+    with open(path, 'rb') as f:
+        (length,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length))
+    header.pop('__metadata__', None)
+    return header, 8 + length
+
+
+def mmap_state_dict(path):
+    """Tensors of one safetensors file as views into a copy-on-write mapping of it"""
+    header, data_start = read_header(path)
+    # shared=False maps the file MAP_PRIVATE: readers share the page cache,
+    # and a write would only ever touch a private copy of the page
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+    state = {}
+    for name, info in header.items():
+        dtype = DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        offset = data_start + begin
+        if offset % itemsize:
+            raise ValueError(f"tensor {name} is not aligned to its {itemsize}-byte dtype")
+        shape = info['shape']
+        tensor = torch.empty(0, dtype=dtype)
+        tensor.set_(storage, offset // itemsize, shape, torch.empty(shape, device='meta').stride())
+        if tensor.numel() * itemsize != end - begin:
+            raise ValueError(f"tensor {name} size does not match its byte range")
+        state[name] = tensor
+    return state
+
+
+def load_model(directory):
+    """
+    Build the causal LM saved in ``directory`` on memory-mapped weights.
+
+    Raises if the directory has no safetensors weights or they do not cover
+    the model's parameters; callers fall back to ``from_pretrained``.
+    """
+    from transformers import AutoConfig, AutoModelForCausalLM
+    try:
+        from transformers.initialization import no_init_weights  # transformers 5.x
+    except ImportError:
+        from transformers.modeling_utils import no_init_weights
+
+    files = weight_files(directory)
+    if not files:
+        raise FileNotFoundError(f"no {WEIGHTS_FILE} in {directory}")
+    state = {}
+    for path in files:
+        state.update(mmap_state_dict(path))
+
+    config = AutoConfig.from_pretrained(directory)
+    dtype = next((t.dtype for t in state.values() if t.is_floating_point()), torch.float32)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=dtype)
+
+    # Base-model checkpoints (like the hub's gpt2) store keys without the
+    # "transformer." prefix of the LM head model
+    prefix = model.base_model_prefix + '.'
+    if prefix != '.' and not any(name.startswith(prefix) for name in state):
+        state = {prefix + name: tensor for name, tensor in state.items()}
+
+    missing, _ = model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    tied = set(getattr(model, '_tied_weights_keys', None) or ())
+    parameters = dict(model.named_parameters(remove_duplicate=False))
+    uninitialised = [name for name in missing if name in parameters and name not in tied]
+    if uninitialised:
+        raise ValueError(f"weights missing from the checkpoint: {', '.join(uninitialised[:5])}")
+    return model.eval()
+
@@ -0,0 +1,30 @@
+"""
+Platform specifications shared by the generator, the app and the utilities.
+
+Every per-platform number lives here once, so the caption budget, the length
+check shown in the UI and ``utils.validate_caption_length`` can never drift
+apart.
+"""
+
+PLATFORM_SPECS = {
+    "Instagram": {"char_limit": 2200},
+    "Twitter": {"char_limit": 280},
+    "LinkedIn": {"char_limit": 3000},
+    "Facebook": {"char_limit": 63206},
+}
+
+# Spec used for platforms missing from the table
+DEFAULT_PLATFORM = "Instagram"
+
+# Share of the limit below which a caption counts as optimally sized
+OPTIMAL_LENGTH_RATIO = 0.8
+
+# Platform -> character limit
+PLATFORM_LENGTHS = {name: spec["char_limit"] for name, spec in PLATFORM_SPECS.items()}
+
+
+def char_limit(platform, default=None):
+    """Character limit for ``platform``, or ``default`` (the default platform's limit) if unknown"""
+    if platform in PLATFORM_LENGTHS:
+        return PLATFORM_LENGTHS[platform]
+    return PLATFORM_LENGTHS[DEFAULT_PLATFORM] if default is None else default
@@ -0,0 +1,102 @@
+"""
+Batch post-processing of raw model continuations.
+
+The cleaning rules are the ones the generator has always applied:
+
+1. cut everything after the first sentence end followed by a capitalised
+   word, preferring ``". X"`` over ``"? X"`` over ``"! X"``;
+2. drop a trailing incomplete sentence, joining the complete ones with
+   ``". "``, or end the caption with a period if it has no punctuation;
+3. if the caption is still longer than ``max_length``, keep only its first
+   sentence.
+
+The rules used to run as separate regex passes, string rebuilds and three
+``find`` scans per caption. Here each rule is decided from at most a couple
+of precompiled scans over the caption, most captions take only the first
+one, and whole batches are processed per call.
+"""
+import random
+import re
+
+# A sentence end followed by a capitalised word; group 1 is the mark
+SENTENCE_BREAK = re.compile(r'([.?!]) [A-Z]')
+# The same, for one mark only, in the order breaks are preferred
+MARK_BREAKS = {mark: re.compile(re.escape(mark) + ' [A-Z]') for mark in '.?!'}
+BREAK_PRIORITY = '.?!'
+PUNCT = re.compile(r'[.!?]')
+PUNCT_RUN = re.compile(r'[.!?]+')
+SENTENCE_MARKS = ('.', '!', '?')
+
+
+def _first_break(caption):
+    """End of the preferred sentence break in ``caption``, or -1"""
+    match = SENTENCE_BREAK.search(caption)
+    if match is None:
+        return -1
+    mark = match.group(1)
+    if mark == BREAK_PRIORITY[0]:
+        return match.start() + 1
+    # A later break with a preferred mark still wins over this earlier one
+    for preferred in BREAK_PRIORITY[:BREAK_PRIORITY.index(mark)]:
+        later = MARK_BREAKS[preferred].search(caption, match.end())
+        if later is not None:
+            return later.start() + 1
+    return match.start() + 1
+
+
+class CaptionPostProcessor:
+    """Clean raw generations and append calls-to-action, for many captions at once"""
+
+    def __init__(self, cta_templates, max_length=300):
+        self.cta_templates = cta_templates
+        self.max_length = max_length
+
+    def clean(self, text):
+        """Cut one raw continuation down to a complete, reasonably short caption"""
+        caption = text.strip()
+
+        # Rule 1: cut at the preferred sentence break
+        cut = _first_break(caption)
+        if cut != -1:
+            caption = caption[:cut]
+        elif not caption.endswith(SENTENCE_MARKS):
+            # Rule 2: drop the incomplete sentence after the last mark
+            last = max(caption.rfind('.'), caption.rfind('!'), caption.rfind('?'))
+            if last == -1:
+                # No marks at all; the added period is also the first sentence end
+                return caption + '.'
+            while last and caption[last - 1] in '.!?':
+                last -= 1
+            caption = PUNCT_RUN.sub('. ', caption[:last]) + '.'
+
+        # Rule 3: keep the first sentence of captions that are still too long
+        if len(caption) > self.max_length:
+            caption = caption[:PUNCT.search(caption).start() + 1]
+        return caption
+
+    def clean_all(self, texts):
+        """Clean a list of raw continuations"""
+        clean = self.clean
+        return [clean(text) for text in texts]
+
+    def add_ctas(self, captions, platform, include_cta=True, rng=random):
+        """
+        Append one random call-to-action per caption where it still fits.
+
+        ``rng.choice`` is called once per caption, in order, so seeded runs
+        pick the same CTAs as before.
+        """
+        ctas = self.cta_templates.get(platform)
+        if not include_cta or not ctas:
+            return list(captions)
+        choose = rng.choice
+        limit = self.max_length - 1
+        finished = []
+        for caption in captions:
+            cta = choose(ctas)
+            finished.append(caption + ' ' + cta if len(caption) + len(cta) <= limit else caption)
+        return finished
+
+    def process(self, texts, platform, include_cta=True, rng=random):
+        """Clean raw continuations and add calls-to-action in one call"""
+        return self.add_ctas(self.clean_all(texts), platform, include_cta, rng)
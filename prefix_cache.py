@@ -0,0 +1,85 @@
+"""
+Precomputed KV cache for the fixed instruction prefix of each tone template.
+
+Every prompt rendered from a tone template starts with the same text, e.g.
+"Create a short, casual social media post about". The key/value states for
+that prefix are computed once when the model loads; generation then starts
+from a copy of them and only the keyword suffix has to be encoded.
+"""
+import torch
+
+PLACEHOLDER = '{keywords}'
+
+
+def split_template(template):
+    """Split a template into its static prefix and the suffix template"""
+    # Cut before the space that precedes the placeholder, which is where
+    # GPT-2's pre-tokenizer splits anyway, so the token ids line up
+    prefix = template[:template.index(PLACEHOLDER)].rstrip(' ')
+    return prefix, template[len(prefix):]
+
+
+def _to_legacy(past_key_values):
+    """Return past_key_values as a tuple of (key, value) pairs per layer"""
+    if hasattr(past_key_values, 'to_legacy_cache'):
+        return past_key_values.to_legacy_cache()
+    if hasattr(past_key_values, 'layers'):
+        return tuple((layer.keys, layer.values) for layer in past_key_values.layers)
+    return tuple(past_key_values)
+
+
+def _from_legacy(model, legacy):
+    """Wrap (key, value) pairs in whatever cache object the model expects"""
+    if not getattr(model, '_supports_cache_class', True):
+        return legacy
+    try:
+        from transformers import DynamicCache
+    except ImportError:
+        return legacy
+    cache = DynamicCache()
+    for layer_idx, (key, value) in enumerate(legacy):
+        cache.update(key, value, layer_idx)
+    return cache
+
+
+class PrefixCache:
+    """Per-tone prefix token ids and their precomputed key/value states"""
+
+    def __init__(self, model, tokenizer, templates):
+        self.model = model
+        self.tokenizer = tokenizer
+        self._entries = {}
+        for tone, template in templates.items():
+            if PLACEHOLDER not in template:
+                continue
+            prefix, _ = split_template(template)
+            prefix_ids = tokenizer(prefix, return_tensors='pt')['input_ids']
+            with torch.no_grad():
+                past = model(input_ids=prefix_ids, use_cache=True).past_key_values
+            self._entries[tone] = (prefix, prefix_ids, _to_legacy(past))
+
+    def __contains__(self, tone):
+        return tone in self._entries
+
+    def prefix_length(self, tone):
+        return self._entries[tone][1].shape[1]
+
+    def encode(self, tone, prompt):
+        """
+        Return the full input ids for a rendered prompt, encoding only the
+        suffix, or None when the prompt does not start with the tone's prefix.
+        """
+        prefix, prefix_ids, _ = self._entries[tone]
+        if not prompt.startswith(prefix):
+            return None
+        suffix_ids = self.tokenizer(prompt[len(prefix):], return_tensors='pt')['input_ids']
+        return torch.cat([prefix_ids, suffix_ids], dim=1)
+
+    def past_for_batch(self, tone, batch_size):
+        """A fresh copy of the tone's prefix cache, repeated for ``batch_size`` rows"""
+        legacy = self._entries[tone][2]
+        expanded = tuple(
+            (key.expand(batch_size, -1, -1, -1).contiguous(), value.expand(batch_size, -1, -1, -1).contiguous())
+            for key, value in legacy
+        )
+        return _from_legacy(self.model, expanded)
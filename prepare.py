@@ -0,0 +1,107 @@
+"""
+Fetch the model and NLTK corpora ahead of time.
+
+Everything is written under the resource directory (``resources/`` next to
+the code, or ``CAPTION_RESOURCE_DIR``), which caption_generator checks before
+going to the network. Run this once at build/deploy time, then start the app
+with ``CAPTION_OFFLINE=1`` so no process ever blocks on a download.
+
+It also builds the semantic hashtag/emoji index from the model's token
+embeddings (``--hashtags FILE`` adds a larger hashtag vocabulary) and, with
+``--corpus FILE``, learns keyword hashtag/emoji tables from past posts.
+
+Usage:
+    python prepare.py [--model gpt2] [--hashtags hashtags.txt] [--corpus posts.jsonl]
+"""
+import argparse
+import os
+import sys
+
+# The only NLTK resource the app uses: the English stop-word list
+NLTK_PACKAGES = ['stopwords']
+
+
+def prepare_nltk(resource_dir):
+    """Download the NLTK corpora into ``resource_dir/nltk_data``"""
+    import nltk
+
+    target = os.path.join(resource_dir, 'nltk_data')
+    os.makedirs(target, exist_ok=True)
+    for package in NLTK_PACKAGES:
+        ok = nltk.download(package, download_dir=target, quiet=True)
+        print(f"nltk {package}: {'ok' if ok else 'FAILED'}")
+    return target
+
+
+def prepare_model(resource_dir, model_name):
+    """Download the model and tokenizer and save them as local safetensors"""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    target = os.path.join(resource_dir, 'models', model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    tokenizer.save_pretrained(target)
+    model.save_pretrained(target, safe_serialization=True)
+    print(f"model {model_name}: saved to {target}")
+    return target
+
+
+def prepare_semantic_index(model_dir, extra_tags_path=None):
+    """Build the embedding index used for related hashtags and emojis"""
+    from caption_generator import SEMANTIC_INDEX_DIR
+    from semantic_index import build_from_model
+
+    extra = []
+    if extra_tags_path:
+        with open(extra_tags_path, encoding='utf-8') as f:
+            extra = f.read().split()
+    sizes = build_from_model(model_dir, SEMANTIC_INDEX_DIR, extra)
+    print(f"semantic index: {sizes['hashtags']} hashtags, {sizes['emojis']} emojis saved to {SEMANTIC_INDEX_DIR}")
+    return SEMANTIC_INDEX_DIR
+
+
+def prepare_corpus_index(corpus_path):
+    """Learn keyword -> hashtag/emoji tables from a JSON-lines file of past posts"""
+    from caption_generator import CORPUS_INDEX_PATH
+    from corpus_index import count_corpus, write_index
+
+    counts, _ = count_corpus(corpus_path)
+    index = write_index(CORPUS_INDEX_PATH, counts)
+    print(f"corpus index: {index['posts']} posts, {len(index['hashtags'])} keywords saved to {CORPUS_INDEX_PATH}")
+    return CORPUS_INDEX_PATH
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bundle the model and NLTK data for offline use.")
+    parser.add_argument("--model", default=os.environ.get('CAPTION_MODEL', 'gpt2'), help="Hub model name to bundle")
+    parser.add_argument("--resource-dir", help="Target directory (default: CAPTION_RESOURCE_DIR or ./resources)")
+    parser.add_argument("--skip-model", action="store_true", help="Only fetch the NLTK corpora")
+    parser.add_argument("--hashtags", help="Extra hashtag vocabulary for the semantic index, one tag per line")
+    parser.add_argument("--corpus", help="JSON lines file of past posts to learn hashtag/emoji tables from")
+    args = parser.parse_args(argv)
+
+    if args.resource_dir:
+        os.environ['CAPTION_RESOURCE_DIR'] = args.resource_dir
+    from caption_generator import RESOURCE_DIR
+
+    prepare_nltk(RESOURCE_DIR)
+    if not args.skip_model:
+        model_dir = prepare_model(RESOURCE_DIR, args.model)
+        prepare_semantic_index(model_dir, args.hashtags)
+    if args.corpus:
+        prepare_corpus_index(args.corpus)
+
+    # Check that everything now resolves from disk alone
+    os.environ['CAPTION_OFFLINE'] = '1'
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    import caption_generator
+    caption_generator.OFFLINE_MODE = True
+    print(f"nltk resources: {caption_generator.nltk_resources()}")
+    if not args.skip_model and caption_generator.load_model() is None:
+        sys.exit("Prepared model could not be loaded offline")
+    if not args.skip_model and caption_generator._semantic_index() is None:
+        sys.exit("Semantic index could not be loaded")
+
+
+if __name__ == "__main__":
+    main()
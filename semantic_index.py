@@ -0,0 +1,223 @@
+"""
+Semantic hashtag and emoji retrieval from GPT-2 token embeddings.
+
+The topic tables only fire when a key such as "travel" literally appears in
+the keywords. This index instead embeds every hashtag and emoji in a large
+vocabulary once, offline, as the mean of GPT-2's input token embeddings for
+its description ("#MorningVibes" -> "morning vibes", "☕" -> "hot beverage
+coffee"), centred and L2-normalised. Queries are embedded the same way and
+the top-k labels come from a single matrix-vector product (matrix-matrix for
+batches) against the stored vocabulary matrix.
+
+Everything lives in one directory of ``.npy`` files that are memory-mapped,
+so loading the index costs a few page faults, not a model load; only the
+tokenizer is parsed at start-up.
+
+Build it with ``python prepare.py`` or ``python -m semantic_index --output DIR``.
+"""
+import argparse
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+META_FILE = 'meta.json'
+TOKENIZER_FILE = 'tokenizer.json'
+TOKENS_FILE = 'tokens.npy'
+MEAN_FILE = 'mean.npy'
+
+# Scores below this are too weak to suggest
+MIN_SCORE = 0.3
+
+# Code point ranges scanned for emojis with a Unicode name
+EMOJI_RANGES = ((0x2600, 0x27C0), (0x1F300, 0x1F650), (0x1F680, 0x1F700), (0x1F900, 0x1FB00))
+
+VARIATION_SELECTOR = '\ufe0f'
+
+# Hashtag words: "MorningVibes2024" -> Morning, Vibes, 2024
+HASHTAG_WORD = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+')
+
+
+def hashtag_text(tag):
+    """Plain-words description of a hashtag"""
+    return ' '.join(word.lower() for word in HASHTAG_WORD.findall(tag.lstrip('#')))
+
+
+def emoji_vocabulary(keyword_map=None):
+    """
+    ``(emoji, description)`` pairs for every named pictographic code point.
+
+    Keys of ``keyword_map`` (keyword -> emojis) are appended to the Unicode
+    name of each emoji they list, and emojis only found there (e.g. ZWJ
+    sequences) are included under the keyword alone.
+    """
+    extra = {}
+    for keyword, emojis in (keyword_map or {}).items():
+        for emoji in emojis:
+            extra.setdefault(emoji, []).append(keyword)
+
+    vocabulary = {}
+    for start, stop in EMOJI_RANGES:
+        for code in range(start, stop):
+            char = chr(code)
+            name = unicodedata.name(char, None)
+            if name and unicodedata.category(char) == 'So':
+                vocabulary[char] = name.lower()
+    for emoji, keywords in extra.items():
+        # Keep the table's presentation form ("❤️") in place of the bare code point
+        base = vocabulary.pop(emoji, None) or vocabulary.pop(emoji.rstrip(VARIATION_SELECTOR), '')
+        vocabulary[emoji] = ' '.join([base] + keywords).strip()
+    return list(vocabulary.items())
+
+
+def hashtag_vocabulary(topic_map=None, platform_map=None, extra_tags=()):
+    """``(hashtag, description)`` pairs from the suggestion tables plus ``extra_tags``"""
+    described = {}
+    for topic, tags in (topic_map or {}).items():
+        for tag in tags:
+            # The topic a tag is filed under says more than its own words
+            described[tag] = f"{hashtag_text(tag)} {topic}"
+    for tags in (platform_map or {}).values():
+        for tag in tags:
+            described.setdefault(tag, hashtag_text(tag))
+    for tag in extra_tags:
+        tag = tag.strip()
+        if tag:
+            tag = tag if tag.startswith('#') else '#' + tag
+            described.setdefault(tag, hashtag_text(tag))
+    return [(tag, text) for tag, text in described.items() if text]
+
+
+def _embed(texts, tokenizer, tokens, mean):
+    """Centred, L2-normalised mean token embeddings, one row per text"""
+    encodings = tokenizer.encode_batch([' ' + text for text in texts])
+    vectors = np.zeros((len(texts), tokens.shape[1]), dtype=np.float32)
+    for row, encoding in enumerate(encodings):
+        if encoding.ids:
+            # Fancy indexing reads just these rows from the memory map
+            vectors[row] = tokens[np.asarray(encoding.ids)].astype(np.float32).mean(axis=0)
+    vectors -= mean
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def build_index(directory, token_embeddings, tokenizer, vocabularies):
+    """
+    Write an index to ``directory``.
+
+    ``token_embeddings`` is the model's input embedding matrix (vocab x dim),
+    ``tokenizer`` a ``tokenizers.Tokenizer`` and ``vocabularies`` maps each
+    kind ("hashtags", "emojis") to ``(label, description)`` pairs.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tokens = np.asarray(token_embeddings, dtype=np.float16)
+    # GPT-2 embeddings share a large common direction; centring removes it
+    mean = np.asarray(token_embeddings, dtype=np.float32).mean(axis=0)
+    np.save(os.path.join(directory, TOKENS_FILE), tokens)
+    np.save(os.path.join(directory, MEAN_FILE), mean)
+    tokenizer.save(os.path.join(directory, TOKENIZER_FILE))
+
+    labels = {}
+    for kind, pairs in vocabularies.items():
+        labels[kind] = [label for label, _ in pairs]
+        matrix = _embed([text for _, text in pairs], tokenizer, tokens, mean)
+        np.save(os.path.join(directory, f'{kind}.npy'), matrix)
+    with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'dim': int(tokens.shape[1]), 'labels': labels}, f, ensure_ascii=False)
+    return directory
+
+
+class SemanticIndex:
+    """Memory-mapped vocabulary matrices with cosine top-k lookup"""
+
+    def __init__(self, directory):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.labels = meta['labels']
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, TOKENIZER_FILE))
+        self.tokens = np.load(os.path.join(directory, TOKENS_FILE), mmap_mode='r')
+        self.mean = np.load(os.path.join(directory, MEAN_FILE))
+        self.matrices = {
+            kind: np.load(os.path.join(directory, f'{kind}.npy'), mmap_mode='r')
+            for kind in self.labels
+        }
+
+    def embed(self, texts):
+        return _embed(texts, self.tokenizer, self.tokens, self.mean)
+
+    def search(self, kind, queries, k=3, min_score=MIN_SCORE):
+        """
+        Top-``k`` ``(label, score)`` lists for each query string.
+
+        All queries are scored with one (vocabulary x dim) @ (dim x queries)
+        product; empty queries get empty results.
+        """
+        if kind not in self.matrices or not queries:
+            return [[] for _ in queries]
+        matrix, labels = self.matrices[kind], self.labels[kind]
+        k = min(k, len(labels))
+        if k <= 0:
+            return [[] for _ in queries]
+
+        scores = matrix @ self.embed(queries).T  # vocabulary x queries
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for column, query in enumerate(queries):
+            if not query.strip():
+                results.append([])
+                continue
+            rows = top[:, column]
+            ranked = rows[np.argsort(-scores[rows, column])]
+            results.append([
+                (labels[row], float(scores[row, column]))
+                for row in ranked if scores[row, column] >= min_score
+            ])
+        return results
+
+    def search_one(self, kind, query, k=3, min_score=MIN_SCORE):
+        """Top-``k`` for a single query (one matrix-vector product)"""
+        return self.search(kind, [query], k, min_score)[0]
+
+
+def build_from_model(source, output, extra_tags=()):
+    """Build the index for the suggestion tables from the model at ``source``"""
+    import caption_generator
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForCausalLM.from_pretrained(source)
+    embeddings = model.get_input_embeddings().weight.detach().float().numpy()
+    vocabularies = {
+        'hashtags': hashtag_vocabulary(
+            caption_generator.TOPIC_HASHTAGS, caption_generator.PLATFORM_HASHTAGS, extra_tags
+        ),
+        'emojis': emoji_vocabulary(caption_generator.KEYWORD_EMOJI_MAP),
+    }
+    build_index(output, embeddings, tokenizer.backend_tokenizer, vocabularies)
+    return {kind: len(pairs) for kind, pairs in vocabularies.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the semantic hashtag/emoji index.")
+    parser.add_argument("--output", help="Index directory (default: CAPTION_SEMANTIC_INDEX or <resource dir>/semantic_index)")
+    parser.add_argument("--hashtags", help="Extra hashtag vocabulary, one tag per line")
+    args = parser.parse_args(argv)
+
+    import caption_generator
+
+    extra = []
+    if args.hashtags:
+        with open(args.hashtags, encoding='utf-8') as f:
+            extra = f.read().split()
+    output = args.output or caption_generator.SEMANTIC_INDEX_DIR
+    sizes = build_from_model(caption_generator.model_source(), output, extra)
+    print(f"semantic index: {sizes['hashtags']} hashtags, {sizes['emojis']} emojis written to {output}")
+
+
+if __name__ == "__main__":
+    main()
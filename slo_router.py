@@ -0,0 +1,120 @@
+"""
+Latency-SLO aware routing between the model and cheaper answers.
+
+Every model call in a process queues for one inference thread (or for a
+fixed number of pool workers), so once requests arrive faster than the model
+serves them, latency grows without bound. ``SLORouter`` predicts how long a
+new request would take on the model from the recent per-request service
+time and the number of requests already admitted but not yet finished:
+
+    predicted = p90(service time) * (in-flight + new) / capacity
+
+If that misses the SLO, the request is shed: it gets the most recent model
+output for the same request when there is one, else a template caption.
+Service-time samples older than ``horizon`` are forgotten, and while
+shedding one request per ``probe_interval`` still goes to the model, so the
+estimate keeps tracking the model and routing recovers by itself once load
+drops.
+
+Enabled for ``generate_caption`` and friends with ``CAPTION_SLO_MS``.
+"""
+import collections
+import os
+import threading
+import time
+
+import metrics
+from generation_cache import LRUCache
+
+PATHS = ('model', 'cache', 'fallback')
+
+# Service-time percentile used for the prediction
+SERVICE_PERCENTILE = 90
+
+
+class SLORouter:
+    """Decide per request whether the model can answer within ``slo_ms``"""
+
+    def __init__(self, slo_ms, capacity=1, window=64, horizon=30.0, probe_interval=1.0, recent_entries=1024):
+        self.slo = slo_ms / 1000
+        self.capacity = max(1, capacity)
+        self.horizon = horizon
+        self.probe_interval = probe_interval
+        self.recent = LRUCache(recent_entries)
+        self._samples = collections.deque(maxlen=window)  # (finished at, seconds per request)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_probe = 0.0
+        self._stats = dict.fromkeys(PATHS, 0)
+        self._stats['probes'] = 0
+
+    def _service_time(self, now):
+        while self._samples and now - self._samples[0][0] > self.horizon:
+            self._samples.popleft()
+        if not self._samples:
+            return None
+        times = sorted(seconds for _, seconds in self._samples)
+        return times[min(len(times) - 1, len(times) * SERVICE_PERCENTILE // 100)]
+
+    def _predict(self, now, size):
+        service = self._service_time(now)
+        if service is None:
+            return None
+        return service * (self._in_flight + size) / self.capacity
+
+    def admit(self, size=1):
+        """
+        True if ``size`` requests should go to the model; the caller must then
+        call ``release`` when the model call ends, whatever its outcome.
+        """
+        now = time.monotonic()
+        with self._lock:
+            predicted = self._predict(now, size)
+            admitted = predicted is None or predicted <= self.slo
+            if not admitted and now - self._last_probe >= self.probe_interval:
+                # Keep sampling the model so the estimate can recover
+                self._stats['probes'] += 1
+                admitted = True
+            if admitted:
+                self._in_flight += size
+                self._last_probe = now
+        return admitted
+
+    def release(self, size, elapsed):
+        """
+        Finish ``size`` admitted requests whose model call took ``elapsed``
+        seconds; ``None`` (failed call) records no service-time sample.
+        """
+        with self._lock:
+            self._in_flight -= size
+            if elapsed is not None:
+                self._samples.append((time.monotonic(), elapsed / max(1, size)))
+
+    def count(self, path, n=1):
+        """Record ``n`` requests answered by ``path`` (one of ``PATHS``)"""
+        with self._lock:
+            self._stats[path] += n
+        metrics.count('route', n, path=path)
+
+    def stats(self):
+        """Requests per path plus the current prediction inputs, in ms"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            service = self._service_time(now)
+            stats['in_flight'] = self._in_flight
+            predicted = self._predict(now, 1)
+        total = sum(stats[path] for path in PATHS)
+        stats['shed_ratio'] = (stats['cache'] + stats['fallback']) / total if total else 0.0
+        stats['slo_ms'] = self.slo * 1000
+        stats['service_ms'] = service * 1000 if service is not None else None
+        stats['predicted_ms'] = predicted * 1000 if predicted is not None else None
+        return stats
+
+
+def router_from_env(capacity=1):
+    """Build a router from ``CAPTION_SLO_MS``; None when it is unset or 0"""
+    slo_ms = float(os.environ.get('CAPTION_SLO_MS', '0') or 0)
+    if slo_ms <= 0:
+        return None
+    return SLORouter(slo_ms, capacity)
@@ -0,0 +1,36 @@
+"""
+Stopping criterion that ends decoding once a caption is usable.
+
+Post-processing keeps only the first complete sentence of each generation
+and never more than the platform's character budget, so every token decoded
+after that point is paid for and then thrown away.
+"""
+import re
+
+import torch
+from transformers import StoppingCriteria
+
+# A sentence with at least one word character, closed by . ! or ? and then
+# whitespace, so "3.5" or "example.com" inside a sentence do not end it. The
+# whitespace arrives with the next token, so rows stop one token later.
+SENTENCE_END = re.compile(r'\w[^.!?]*[.!?]+(?=\s)')
+
+
+class SentenceBudgetStopping(StoppingCriteria):
+    """
+    Stop each row as soon as its continuation holds a complete sentence or
+    reaches that row's character budget.
+    """
+
+    def __init__(self, tokenizer, prompt_length, char_budgets):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.char_budgets = list(char_budgets)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        done = [
+            SENTENCE_END.search(text) is not None or len(text.strip()) >= budget
+            for text, budget in zip(texts, self.char_budgets)
+        ]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
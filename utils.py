@@ -1,6 +1,11 @@
 """
 Utility functions for the Social Media Caption Generator
 """
+import re
+
+# URLs, mentions and hashtags are not caption keywords
+STRIP_PATTERN = re.compile(r'http\S+|@\w+|#\w+')
+CAPTION_WORD_PATTERN = re.compile(r'\b[a-z]{3,}\b')
 
 def get_platform_tips(platform):
     """Get platform-specific tips for better engagement"""
@@ -38,17 +43,12 @@ def get_platform_tips(platform):
 
 def validate_caption_length(caption, platform):
     """Validate if caption length is appropriate for the platform"""
-    limits = {
-        "Instagram": 2200,
-        "Twitter": 280,
-        "LinkedIn": 3000,
-        "Facebook": 63206
-    }
+    from platforms import OPTIMAL_LENGTH_RATIO, char_limit
     
-    limit = limits.get(platform, 2200)
+    limit = char_limit(platform)
     length = len(caption)
     
-    if length <= limit * 0.8:  # 80% of limit
+    if length <= limit * OPTIMAL_LENGTH_RATIO:
         return "optimal", f"✅ Perfect length ({length}/{limit} chars)"
     elif length <= limit:
         return "good", f"✅ Good length ({length}/{limit} chars)"
@@ -64,23 +64,23 @@ def get_optimal_posting_times():
         "Facebook": "1-4 PM weekdays"
     }
 
-def extract_keywords_from_caption(caption):
-    """Extract potential keywords from an existing caption"""
-    import re
-    from nltk.corpus import stopwords
-    
-    try:
-        stop_words = set(stopwords.words('english'))
-    except:
-        stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at'])
+def extract_keywords_from_caption(caption, limit=10, stop_words=None):
+    """
+    Extract potential keywords from an existing caption.
+
+    Keywords come back in the order they first appear; ``limit=None`` keeps
+    them all. ``stop_words`` defaults to the suggesters' cached set (NLTK's
+    list when available, a basic built-in list otherwise).
+    """
+    if stop_words is None:
+        from caption_generator import _stop_words
+        stop_words = _stop_words()
     
     # Remove URLs, mentions, and hashtags
-    clean_caption = re.sub(r'http\S+|@\w+|#\w+', '', caption.lower())
-    
-    # Extract words
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', clean_caption)
-    
-    # Filter out stop words
-    keywords = [word for word in words if word not in stop_words]
+    clean_caption = STRIP_PATTERN.sub('', caption.lower())
     
-    return list(set(keywords))[:10]  # Return unique keywords, max 10
+    # Extract words, filter out stop words and keep the first occurrence of each
+    keywords = dict.fromkeys(
+        word for word in CAPTION_WORD_PATTERN.findall(clean_caption) if word not in stop_words
+    )
+    return list(keywords)[:limit]
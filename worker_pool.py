@@ -0,0 +1,345 @@
+"""
+Multi-process caption generation.
+
+One torch pipeline in one process serialises every user and batch job on a
+single model. ``WorkerPool`` starts N worker processes, each loading its own
+model with torch pinned to a fixed number of threads (and optionally to its
+own CPU cores). Jobs wait in one shared queue in the parent and a dispatcher
+thread hands each job to the next idle worker over that worker's own pipe.
+
+Each worker talks only over its private pipe, so a worker that is killed
+mid-read or mid-write cannot wedge a lock the others need (as it could with a
+shared ``multiprocessing.Queue``). The dispatcher watches the process
+sentinels, restarts a dead worker on a fresh pipe and requeues the job it
+was running; a job that keeps killing workers is failed after
+``MAX_ATTEMPTS``.
+
+Enabled for ``generate_caption`` and friends with ``CAPTION_WORKERS=N``;
+``CAPTION_WORKER_THREADS`` sets torch threads per worker (default: CPU count
+divided by N) and ``CAPTION_WORKER_PIN=1`` pins each worker to its own cores.
+"""
+import collections
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+# A job that killed this many workers is failed instead of retried again
+MAX_ATTEMPTS = 2
+
+# Workers dying this many times in a row before loading the model break the pool
+MAX_STARTUP_FAILURES = 3
+
+# Seconds ``generate`` waits for its results, so a wedged pool cannot hang callers
+GENERATE_TIMEOUT = 300
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised for jobs that could not run because worker processes kept dying"""
+
+
+def _worker_cores(index, workers, threads):
+    """CPU ids for worker ``index`` when pinning, or None if they do not fit"""
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < workers * threads:
+        return None
+    return set(cores[index * threads:(index + 1) * threads])
+
+
+def _worker_main(conn, threads, cores):
+    """Worker process: load the model, then run jobs from ``conn`` until ``None``"""
+    # Never start a nested pool or shed load again (the parent's router owns
+    # the SLO), and size torch before it is imported
+    os.environ['CAPTION_WORKERS'] = '0'
+    os.environ['CAPTION_SLO_MS'] = '0'
+    os.environ['CAPTION_INTRA_OP_THREADS'] = str(threads)
+    os.environ['CAPTION_INTER_OP_THREADS'] = '1'
+    if cores:
+        os.sched_setaffinity(0, cores)
+
+    from caption_generator import generate_captions_batch, load_model
+
+    load_model()
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id, requests, n, seed = job
+        try:
+            payload = ('ok', generate_captions_batch(requests, n=n, seed=seed))
+        except Exception as e:
+            payload = ('error', f"{type(e).__name__}: {e}")
+        conn.send(('done', (job_id, payload)))
+
+
+class _Worker:
+    __slots__ = ('index', 'process', 'conn', 'pid', 'ready', 'job_id')
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pid = None
+        self.ready = False
+        self.job_id = None
+
+
+class WorkerPool:
+    """Run caption jobs on ``workers`` model-holding processes fed from one queue"""
+
+    def __init__(self, workers=None, threads_per_worker=None, pin_cores=False, chunk_size=8,
+                 start_method='spawn'):
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.pin_cores = pin_cores
+        self.chunk_size = chunk_size
+        # Forking a process that already runs torch threads can deadlock, so spawn
+        self._context = multiprocessing.get_context(start_method)
+        self._workers = []
+        self._queue = collections.deque()  # job ids waiting for a worker
+        self._jobs = {}  # job id -> [future, job, attempts]
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._wake_reader, self._wake_writer = self._context.Pipe(duplex=False)
+        self._ready = threading.Event()
+        self._dispatcher = None
+        self._stopping = False
+        self._broken = None
+        self._startup_failures = 0
+        self._stats = {'jobs': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'restarts': 0}
+
+    def start(self, timeout=None):
+        """Start the workers; with ``timeout``, wait until they have all loaded the model"""
+        self._workers = [self._spawn(index) for index in range(self.workers)]
+        self._dispatcher = threading.Thread(target=self._dispatch, name='caption-pool-dispatcher', daemon=True)
+        self._dispatcher.start()
+        if timeout is not None and not self._ready.wait(timeout):
+            raise TimeoutError(f"worker pool not ready after {timeout}s")
+        return self
+
+    def _spawn(self, index):
+        cores = _worker_cores(index, self.workers, self.threads_per_worker) if self.pin_cores else None
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.threads_per_worker, cores),
+            name=f'caption-worker-{index}',
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(index, process, parent_conn)
+
+    def _wake(self):
+        try:
+            self._wake_writer.send_bytes(b'')
+        except OSError:
+            pass
+
+    def ready(self):
+        """True while every worker, including restarted ones, has loaded the model"""
+        return self._ready.is_set()
+
+    def stop(self, timeout=10):
+        """Let workers finish their current job, then shut them down"""
+        with self._lock:
+            self._stopping = True
+        self._wake()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+            worker.conn.close()
+        self._fail_pending(RuntimeError("worker pool stopped"))
+
+    def submit(self, requests, n=1, seed=None):
+        """Queue one batch of (keywords, platform, tone, include_cta) requests; returns a Future"""
+        future = Future()
+        job_id = next(self._job_ids)
+        # Checked under the lock the dispatcher fails pending jobs under, so a
+        # job can never be queued after the dispatcher has given up
+        with self._lock:
+            if self._broken:
+                raise WorkerCrashedError(self._broken)
+            if self._dispatcher is None or self._stopping:
+                raise RuntimeError("worker pool is not running")
+            self._jobs[job_id] = [future, (job_id, list(requests), n, seed), 0]
+            self._queue.append(job_id)
+            self._stats['jobs'] += 1
+        self._wake()
+        return future
+
+    def generate(self, requests, n=1, seed=None, timeout=GENERATE_TIMEOUT):
+        """
+        Same contract as ``generate_captions_batch``, spread over the workers.
+
+        Raises ``concurrent.futures.TimeoutError`` if the results are not all
+        back within ``timeout`` seconds (None waits forever).
+        """
+        requests = list(requests)
+        futures = [
+            self.submit(requests[start:start + self.chunk_size], n, seed)
+            for start in range(0, len(requests), self.chunk_size)
+        ]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        results = []
+        for future in futures:
+            remaining = max(0, deadline - time.monotonic()) if deadline is not None else None
+            results.extend(future.result(remaining))
+        return results
+
+    def _dispatch(self):
+        """Own every worker: hand out jobs, collect results and replace dead processes"""
+        while not self._stopping:
+            waitables = {self._wake_reader: None}
+            for worker in self._workers:
+                waitables[worker.conn] = worker
+                waitables[worker.process.sentinel] = worker
+            for ready in wait(list(waitables)):
+                if ready is self._wake_reader:
+                    self._wake_reader.recv_bytes()
+                    continue
+                worker = waitables[ready]
+                if ready is worker.conn:
+                    self._receive(worker)
+                elif not worker.process.is_alive():
+                    self._replace(worker)
+            if self._broken:
+                # _broken is set under the lock and submit checks it under the
+                # lock, so nothing can be queued after this sweep
+                self._fail_pending(WorkerCrashedError(self._broken))
+                return
+            self._assign()
+
+    def _receive(self, worker):
+        try:
+            kind, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            return  # The sentinel reports the death on the next pass
+        if kind == 'ready':
+            worker.pid, worker.ready = payload, True
+            self._startup_failures = 0
+            if all(w.ready for w in self._workers):
+                self._ready.set()
+            return
+        job_id, (status, value) = payload
+        worker.job_id = None
+        with self._lock:
+            entry = self._jobs.pop(job_id, None)
+            if entry is not None:
+                self._stats['completed' if status == 'ok' else 'failed'] += 1
+        if entry is not None:
+            if status == 'ok':
+                entry[0].set_result(value)
+            else:
+                entry[0].set_exception(RuntimeError(value))
+
+    def _replace(self, worker):
+        if self._workers[worker.index] is not worker:
+            return  # Already replaced earlier in this pass
+        process = worker.process
+        process.join()
+        logger.warning("Caption worker %s (pid %s) exited with %s; restarting",
+                       worker.index, process.pid, process.exitcode)
+        worker.conn.close()
+        crashed = None
+        with self._lock:
+            if not worker.ready:
+                self._startup_failures += 1
+                if self._startup_failures >= MAX_STARTUP_FAILURES:
+                    # Restarting cannot help: bad environment, model or import
+                    self._broken = f"caption workers failed to start {self._startup_failures} times in a row"
+            entry = self._jobs.get(worker.job_id) if worker.job_id is not None else None
+            if entry is not None:
+                if entry[2] >= MAX_ATTEMPTS:
+                    del self._jobs[worker.job_id]
+                    self._stats['failed'] += 1
+                    crashed = entry[0]
+                else:
+                    self._queue.appendleft(worker.job_id)
+                    self._stats['retried'] += 1
+            if not self._broken:
+                self._stats['restarts'] += 1
+        if crashed is not None:
+            crashed.set_exception(WorkerCrashedError(f"caption worker crashed {MAX_ATTEMPTS} times on this job"))
+        if self._broken:
+            logger.error("%s; giving up on the worker pool", self._broken)
+            return
+        # Not ready again until the replacement reports that it loaded the model
+        self._ready.clear()
+        self._workers[worker.index] = self._spawn(worker.index)
+
+    def _assign(self):
+        for worker in self._workers:
+            if not worker.ready or worker.job_id is not None:
+                continue
+            with self._lock:
+                job_id = self._queue.popleft() if self._queue else None
+                entry = self._jobs.get(job_id) if job_id is not None else None
+                if entry is not None:
+                    entry[2] += 1
+            if job_id is None:
+                return
+            if entry is None:
+                continue
+            try:
+                worker.conn.send(entry[1])
+            except OSError:
+                with self._lock:
+                    entry[2] -= 1
+                    self._queue.appendleft(job_id)
+                continue
+            worker.job_id = job_id
+
+    def _fail_pending(self, error):
+        with self._lock:
+            pending = [entry[0] for entry in self._jobs.values()]
+            self._jobs.clear()
+            self._queue.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['queued_jobs'] = len(self._queue)
+            stats['pending_jobs'] = len(self._jobs)
+        workers = list(self._workers)
+        stats['workers'] = self.workers
+        stats['threads_per_worker'] = self.threads_per_worker
+        stats['ready_workers'] = sum(worker.ready for worker in workers)
+        stats['busy_workers'] = sum(worker.job_id is not None for worker in workers)
+        stats['pids'] = [worker.pid for worker in workers]
+        stats['broken'] = self._broken
+        return stats
+
+
+def pool_from_env():
+    """Build (not start) a pool from ``CAPTION_WORKERS``; None when it is unset or 0"""
+    workers = int(os.environ.get('CAPTION_WORKERS', '0') or 0)
+    if workers <= 0:
+        return None
+    threads = int(os.environ.get('CAPTION_WORKER_THREADS', '0') or 0) or None
+    pin = os.environ.get('CAPTION_WORKER_PIN', '').lower() in ('1', 'true', 'yes')
+    return WorkerPool(workers, threads, pin_cores=pin)